@@ -4,26 +4,59 @@ SpeakMate AI - Analysis Routes
 Endpoints for session analysis and reports.
 Supports both current and legacy schema field names.
 """
-from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+import asyncio
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
 from uuid import UUID
+import logging
 
+import numpy as np
+from cachetools import TTLCache
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
+from app.core.cache import cache
 from app.core.security import get_current_user
 from app.db.supabase import db_service
+from app.models.schemas import LegacySessionScores
 from app.workers.queue_config import QueueManager
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/analysis", tags=["analysis"])
 
+# Short TTL keeps ownership/session reads fresh while absorbing dashboard bursts.
+SESSION_CACHE_TTL = 30
 
-class ReanalysisRequest(BaseModel):
-    analysis_type: Optional[str] = "deep"
+# Score polling is answered from process memory; keyed by (user_id, session_id)
+# so a hit is only ever served to the session owner.
+SCORES_CACHE_TTL = 15
+_scores_cache: TTLCache = TTLCache(maxsize=50_000, ttl=SCORES_CACHE_TTL)
+
+# Pre-overall_scores session columns read by LegacySessionScores.
+LEGACY_SCORE_COLUMNS = (
+    "overall_score",
+    "fluency_score",
+    "vocabulary_score",
+    "grammar_score",
+    "pronunciation_score",
+)
 
+# In-flight session loads; dashboards fire several endpoints for one session at once.
+_session_loads: Dict[str, asyncio.Future] = {}
 
-def _run_type(run: dict) -> Optional[str]:
-    return run.get("run_type") or run.get("analysis_type")
+# analysis_runs columns returned to clients, per schema (current run_type/results,
+# legacy analysis_type/result). Skips versioning and cost bookkeeping columns.
+# Select list per analysis_runs type column (see db_service.get_run_type_column)
+RUN_COLUMNS = {
+    "run_type": "id, session_id, run_type, status, results, scores, error_count, created_at, completed_at",
+    "analysis_type": "id, session_id, analysis_type, status, result, created_at",
+}
+
+
+class ReanalysisRequest(BaseModel):
+    analysis_type: Optional[str] = "deep"
 
 
 def _run_result(run: dict) -> dict:
@@ -45,21 +78,46 @@ def _normalize_session_scores(session: dict) -> dict:
     if isinstance(scores, dict):
         return scores
 
-    legacy = {
-        "overall_band": session.get("overall_score"),
-        "fluency_coherence": session.get("fluency_score"),
-        "lexical_resource": session.get("vocabulary_score"),
-        "grammatical_range": session.get("grammar_score"),
-        "pronunciation": session.get("pronunciation_score"),
-    }
-    if any(v is not None for v in legacy.values()):
-        return {k: v for k, v in legacy.items() if v is not None}
+    # Most rows have neither shape yet (e.g. in-progress sessions); skip
+    # model validation when no legacy column is populated.
+    if all(session.get(column) is None for column in LEGACY_SCORE_COLUMNS):
+        return {}
+
+    # Legacy columns are mapped and coerced by pydantic-core in one call.
+    try:
+        return LegacySessionScores.model_validate(session).model_dump(exclude_none=True)
+    except ValidationError:
+        return {}
+
+
+def _session_cache_key(session_id: UUID) -> str:
+    return f"session:{session_id}"
 
-    return {}
+
+async def _fetch_session(session_id: str) -> Optional[dict]:
+    key = _session_cache_key(session_id)
+    session = await cache.get_json(key)
+    if session is None:
+        session = await db_service.get_session(session_id)
+        if session:
+            await cache.set_json(key, session, SESSION_CACHE_TTL)
+    return session
+
+
+async def _load_session(session_id: UUID) -> Optional[dict]:
+    """Coalesce concurrent loads of the same session into one fetch."""
+    key = str(session_id)
+    task = _session_loads.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_session(key))
+        _session_loads[key] = task
+        task.add_done_callback(lambda _: _session_loads.pop(key, None))
+    # Shield so one cancelled request does not cancel the shared fetch.
+    return await asyncio.shield(task)
 
 
 async def _get_owned_session(session_id: UUID, current_user: dict) -> dict:
-    session = await db_service.get_session(str(session_id))
+    session = await _load_session(session_id)
     if not session:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
     if session.get("user_id") != current_user["user_id"]:
@@ -67,36 +125,63 @@ async def _get_owned_session(session_id: UUID, current_user: dict) -> dict:
     return session
 
 
-async def _fetch_error_rows(session_id: str) -> list:
-    # Preferred schema
+def _load_error_rows(session_id: str, errors_table: str) -> list:
+    # session_errors view merges both schemas in one call (migration_performance.sql)
     try:
-        result = (
-            db_service.client.table("error_instances")
+        return (
+            db_service.client.table("session_errors")
             .select("*")
             .eq("session_id", session_id)
             .order("created_at")
             .execute()
-        )
-        rows = result.data or []
-        if rows:
-            return rows
+        ).data or []
     except Exception:
         pass
 
-    # Legacy fallback
     try:
-        legacy = (
-            db_service.client.table("detected_errors")
+        return (
+            db_service.client.table(errors_table)
             .select("*")
             .eq("session_id", session_id)
             .order("created_at")
             .execute()
-        )
-        return legacy.data or []
+        ).data or []
     except Exception:
         return []
 
 
+async def _fetch_error_rows(session_id: str) -> list:
+    errors_table = await db_service.get_errors_table()
+    return await asyncio.to_thread(_load_error_rows, session_id, errors_table)
+
+
+def _load_latest_run(
+    session_id: str,
+    run_type: str,
+    type_column: str,
+    status: Optional[str] = None,
+) -> Optional[dict]:
+    """Latest analysis run of one type, filtered and limited server-side."""
+    try:
+        query = (
+            db_service.client.table("analysis_runs")
+            .select(RUN_COLUMNS[type_column])
+            .eq("session_id", session_id)
+            .eq(type_column, run_type)
+        )
+        if status:
+            query = query.eq("status", status)
+        result = query.order("created_at", desc=True).limit(1).execute()
+        return result.data[0] if result.data else None
+    except Exception:
+        return None
+
+
+async def _fetch_latest_run(session_id: str, run_type: str, status: Optional[str] = None) -> Optional[dict]:
+    type_column = await db_service.get_run_type_column()
+    return await asyncio.to_thread(_load_latest_run, session_id, run_type, type_column, status)
+
+
 @router.get("/sessions/{session_id}")
 async def get_session_analysis(
     session_id: UUID,
@@ -107,24 +192,13 @@ async def get_session_analysis(
 
     Returns fast/deep analysis blocks and a normalized top-level payload for clients.
     """
-    session = await _get_owned_session(session_id, current_user)
-
-    try:
-        runs_result = (
-            db_service.client.table("analysis_runs")
-            .select("*")
-            .eq("session_id", str(session_id))
-            .order("created_at", desc=True)
-            .execute()
-        )
-        runs = runs_result.data or []
-    except Exception:
-        runs = []
-
-    fast_run = next((r for r in runs if _run_type(r) == "fast"), None)
-    deep_run = next((r for r in runs if _run_type(r) == "deep"), None)
-
-    errors = await _fetch_error_rows(str(session_id))
+    # Independent reads run concurrently; an ownership failure discards the rest.
+    session, fast_run, deep_run, errors = await asyncio.gather(
+        _get_owned_session(session_id, current_user),
+        _fetch_latest_run(str(session_id), "fast"),
+        _fetch_latest_run(str(session_id), "deep"),
+        _fetch_error_rows(str(session_id)),
+    )
 
     preferred = deep_run or fast_run
     preferred_type = "deep" if deep_run else ("fast" if fast_run else None)
@@ -134,7 +208,7 @@ async def get_session_analysis(
     scores = session_scores or (_run_scores(preferred) if preferred else {})
 
     return {
-        "session_id": str(session_id),
+        "session_id": session_id,
         "session": {
             **session,
             "duration": session.get("duration_seconds", 0),
@@ -158,6 +232,8 @@ async def trigger_reanalysis(
 ):
     """Trigger re-analysis of a session."""
     await _get_owned_session(session_id, current_user)
+    await cache.delete(_session_cache_key(session_id))
+    _scores_cache.pop((current_user["user_id"], str(session_id)), None)
 
     resolved_type = (body.analysis_type if body and body.analysis_type else analysis_type) or "deep"
 
@@ -166,7 +242,7 @@ async def trigger_reanalysis(
 
     return {
         "status": "queued",
-        "session_id": str(session_id),
+        "session_id": session_id,
         "analysis_type": resolved_type,
         "job_id": getattr(job, "id", None),
     }
@@ -182,20 +258,21 @@ async def get_session_errors(
     """Get detailed errors for a session."""
     await _get_owned_session(session_id, current_user)
 
-    errors = await _fetch_error_rows(str(session_id))
+    rows = await _fetch_error_rows(str(session_id))
 
-    if category:
-        errors = [e for e in errors if e.get("category") == category]
-    if severity:
-        errors = [e for e in errors if e.get("severity") == severity]
-
-    grouped: Dict[str, list] = {}
-    for error in errors:
-        cat = error.get("category", "other")
-        grouped.setdefault(cat, []).append(error)
+    # Filter and group in a single pass over the rows.
+    errors = []
+    grouped: Dict[str, list] = defaultdict(list)
+    for error in rows:
+        if category and error.get("category") != category:
+            continue
+        if severity and error.get("severity") != severity:
+            continue
+        errors.append(error)
+        grouped[error.get("category", "other")].append(error)
 
     return {
-        "session_id": str(session_id),
+        "session_id": session_id,
         "total_errors": len(errors),
         "by_category": grouped,
         "errors": errors,
@@ -208,48 +285,22 @@ async def get_session_scores(
     current_user: dict = Depends(get_current_user)
 ):
     """Get IELTS scores for a session."""
+    cache_key = (current_user["user_id"], str(session_id))
+    cached = _scores_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     session = await _get_owned_session(session_id, current_user)
 
     base_scores = _normalize_session_scores(session)
 
-    latest_deep = None
-    try:
-        deep_result = (
-            db_service.client.table("analysis_runs")
-            .select("*")
-            .eq("session_id", str(session_id))
-            .eq("run_type", "deep")
-            .eq("status", "completed")
-            .order("created_at", desc=True)
-            .limit(1)
-            .execute()
-        )
-        latest_deep = (deep_result.data or [None])[0]
-    except Exception:
-        latest_deep = None
-
-    # Legacy fallback if run_type column isn't used
-    if latest_deep is None:
-        try:
-            legacy_deep = (
-                db_service.client.table("analysis_runs")
-                .select("*")
-                .eq("session_id", str(session_id))
-                .eq("analysis_type", "deep")
-                .eq("status", "completed")
-                .order("created_at", desc=True)
-                .limit(1)
-                .execute()
-            )
-            latest_deep = (legacy_deep.data or [None])[0]
-        except Exception:
-            latest_deep = None
+    latest_deep = await _fetch_latest_run(str(session_id), "deep", "completed")
 
     detailed_scores = _run_scores(latest_deep) if latest_deep else {}
     scores = base_scores or detailed_scores
 
-    return {
-        "session_id": str(session_id),
+    response = {
+        "session_id": session_id,
         "overall_score": scores.get("overall_band"),
         "scores": {
             "fluency_coherence": scores.get("fluency_coherence"),
@@ -259,6 +310,8 @@ async def get_session_scores(
         },
         "detailed": detailed_scores,
     }
+    _scores_cache[cache_key] = response
+    return response
 
 
 @router.post("/sessions/{session_id}/pdf")
@@ -268,37 +321,115 @@ async def generate_pdf_report(
 ):
     """Queue PDF report generation for a session."""
     await _get_owned_session(session_id, current_user)
+    await cache.delete(_session_cache_key(session_id))
 
     queue = QueueManager()
     job = queue.enqueue_pdf_generation(str(session_id), current_user["user_id"])
 
     return {
         "status": "queued",
-        "session_id": str(session_id),
+        "session_id": session_id,
         "job_id": getattr(job, "id", None),
     }
 
 
-@router.get("/user/summary")
-async def get_user_analysis_summary(
-    days: int = Query(30, description="Period in days"),
-    current_user: dict = Depends(get_current_user)
-):
-    """Get user's overall analysis summary."""
-    user_id = current_user["user_id"]
-    since = (datetime.utcnow() - timedelta(days=days)).isoformat()
+def _load_summary(user_id: str, since: str, errors_table: str) -> Dict[str, Any]:
+    """
+    Load summary aggregates for the window starting at `since`.
+
+    Returns sessions_count, average_score, improvement, score_trend (oldest
+    first) and error_counts (Counter by category). Uses the
+    user_analysis_summary RPC, which aggregates in SQL, and falls back to
+    client-side queries when it is not installed.
+    """
+    try:
+        result = db_service.client.rpc(
+            "user_analysis_summary",
+            {"p_user_id": user_id, "p_since": since},
+        ).execute()
+        data = result.data
+        if isinstance(data, dict):
+            return {
+                "sessions_count": int(data.get("sessions_count") or 0),
+                "average_score": data.get("average_score"),
+                "improvement": data.get("improvement"),
+                "score_trend": data.get("score_trend") or [],
+                "error_counts": Counter({
+                    row.get("category") or "other": int(row.get("count") or 0)
+                    for row in data.get("error_counts") or []
+                }),
+            }
+    except Exception as e:
+        logger.debug(f"user_analysis_summary RPC unavailable, using fallback: {e}")
 
-    sessions_result = (
+    session_rows = (
         db_service.client.table("sessions")
         .select("id, overall_scores, overall_score, created_at")
         .eq("user_id", user_id)
         .gte("created_at", since)
         .order("created_at")
         .execute()
+    ).data or []
+    if not session_rows:
+        return {"sessions_count": 0, "error_counts": Counter()}
+
+    score_trend = [
+        {"date": row.get("created_at"), "score": _normalize_session_scores(row).get("overall_band")}
+        for row in session_rows
+    ]
+    bands = np.fromiter(
+        (float(point["score"]) for point in score_trend if point["score"] is not None),
+        dtype=np.float64,
     )
-    sessions = sessions_result.data or []
+    error_counts = Counter(
+        error.get("category", "other")
+        for error in _fetch_error_rows_for_sessions([row["id"] for row in session_rows], errors_table)
+    )
+    return {
+        "sessions_count": len(session_rows),
+        "average_score": float(bands.mean()) if bands.size else None,
+        "improvement": float(bands[-1] - bands[0]) if bands.size >= 2 else None,
+        "score_trend": score_trend,
+        "error_counts": error_counts,
+    }
+
+
+def _fetch_error_rows_for_sessions(session_ids: List[str], errors_table: str) -> List[Dict[str, Any]]:
+    """Fetch error categories for sessions via session_errors, else the deployment's errors table."""
+    try:
+        return (
+            db_service.client.table("session_errors")
+            .select("category")
+            .in_("session_id", session_ids)
+            .execute()
+        ).data or []
+    except Exception:
+        pass
 
-    if not sessions:
+    try:
+        return (
+            db_service.client.table(errors_table)
+            .select("category")
+            .in_("session_id", session_ids)
+            .execute()
+        ).data or []
+    except Exception:
+        return []
+
+
+@router.get("/user/summary")
+async def get_user_analysis_summary(
+    days: int = Query(30, description="Period in days"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get user's overall analysis summary."""
+    user_id = current_user["user_id"]
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+
+    errors_table = await db_service.get_errors_table()
+    summary = await asyncio.to_thread(_load_summary, user_id, since, errors_table)
+
+    if not summary["sessions_count"]:
         return {
             "period_days": days,
             "sessions_count": 0,
@@ -307,57 +438,15 @@ async def get_user_analysis_summary(
             "top_errors": [],
         }
 
-    normalized_scores = []
-    for session in sessions:
-        scores = _normalize_session_scores(session)
-        if scores.get("overall_band") is not None:
-            normalized_scores.append(float(scores["overall_band"]))
-
-    avg_score = sum(normalized_scores) / len(normalized_scores) if normalized_scores else None
-    improvement = None
-    if len(normalized_scores) >= 2:
-        improvement = round(normalized_scores[-1] - normalized_scores[0], 1)
-
-    error_rows = []
-    try:
-        error_rows = (
-            db_service.client.table("error_instances")
-            .select("category")
-            .in_("session_id", [s["id"] for s in sessions])
-            .execute()
-        ).data or []
-    except Exception:
-        error_rows = []
-
-    if not error_rows:
-        try:
-            error_rows = (
-                db_service.client.table("detected_errors")
-                .select("category")
-                .in_("session_id", [s["id"] for s in sessions])
-                .execute()
-            ).data or []
-        except Exception:
-            error_rows = []
-
-    error_counts: Dict[str, int] = {}
-    for error in error_rows:
-        cat = error.get("category", "other")
-        error_counts[cat] = error_counts.get(cat, 0) + 1
-
-    top_errors = sorted(error_counts.items(), key=lambda x: x[1], reverse=True)[:3]
+    avg_score = summary["average_score"]
+    improvement = summary["improvement"]
+    top_errors = summary["error_counts"].most_common(3)
 
     return {
         "period_days": days,
-        "sessions_count": len(sessions),
-        "average_score": round(avg_score, 1) if avg_score is not None else None,
-        "improvement": improvement,
-        "score_trend": [
-            {
-                "date": s["created_at"],
-                "score": _normalize_session_scores(s).get("overall_band"),
-            }
-            for s in sessions
-        ],
+        "sessions_count": summary["sessions_count"],
+        "average_score": round(float(avg_score), 1) if avg_score is not None else None,
+        "improvement": round(float(improvement), 1) if improvement is not None else None,
+        "score_trend": summary["score_trend"],
         "top_errors": [{"category": cat, "count": count} for cat, count in top_errors],
     }
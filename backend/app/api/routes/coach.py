@@ -12,21 +12,30 @@ Daily-use coaching layer:
 """
 from __future__ import annotations
 
-from collections import defaultdict
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional, Any
+import asyncio
 import re
 
+import numpy as np
 from fastapi import APIRouter, Depends, HTTPException, Query, status, Header
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 
+from app.core.cache import cache
 from app.core.config import settings
 from app.core.security import get_current_user
-from app.db.supabase import db_service
-from app.services.coach_engine import coach_engine
+from app.db.supabase import db_service, execute_query
+from app.services.coach_engine import (
+    build_mission_stats,
+    coach_engine,
+    mission_completion_rate,
+)
 from app.workers.queue_config import queue_manager
 
-router = APIRouter(prefix="/coach", tags=["coach"])
+router = APIRouter(prefix="/coach", tags=["coach"], default_response_class=ORJSONResponse)
 
 
 class MissionCompletionRequest(BaseModel):
@@ -61,37 +70,68 @@ class NotificationRunRequest(BaseModel):
     async_job: bool = True
 
 
-def _parse_dt(value: Any) -> Optional[datetime]:
-    if isinstance(value, datetime):
-        if value.tzinfo is None:
-            return value.replace(tzinfo=timezone.utc)
-        return value
-    if not isinstance(value, str) or not value:
-        return None
-    try:
-        return datetime.fromisoformat(value.replace("Z", "+00:00"))
-    except ValueError:
-        return None
+def _days_ago_iso(days: int) -> str:
+    return (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+
+
+PAUSE_THRESHOLD_MS = 700
+
+# Dashboard reloads re-request these; missions are fixed per day once built,
+# and the skill graph moves slowly.
+MISSION_CACHE_TTL = 300
+SKILL_GRAPH_CACHE_TTL = 60
+PROOF_CACHE_TTL = 30
+
+_background_tasks: set[asyncio.Task] = set()
+
+_WORD_RE = re.compile(r"[A-Za-z']+")
+# All filler phrases in one alternation so a transcript is scanned once.
+_FILLER_RE = re.compile(r"\b(?:um|uh|erm|you know|like|actually|basically|i mean)\b")
 
 
 def _count_words(text: str) -> int:
     if not text:
         return 0
-    return len(re.findall(r"[A-Za-z']+", text))
+    return len(_WORD_RE.findall(text))
 
 
 def _count_fillers(text: str) -> int:
     if not text:
         return 0
-    lowered = text.lower()
-    phrases = ["um", "uh", "erm", "you know", "like", "actually", "basically", "i mean"]
-    count = 0
-    for phrase in phrases:
-        if " " in phrase:
-            count += lowered.count(phrase)
-        else:
-            count += len(re.findall(rf"\b{re.escape(phrase)}\b", lowered))
-    return count
+    return len(_FILLER_RE.findall(text.lower()))
+
+
+def _ms_or_nan(value: Any) -> float:
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+
+def _count_pauses(timestamps: Any) -> int:
+    """Count gaps longer than PAUSE_THRESHOLD_MS between consecutive words."""
+    if not isinstance(timestamps, list) or len(timestamps) < 2:
+        return 0
+    n = len(timestamps)
+    starts = np.fromiter((_ms_or_nan(t.get("start_ms")) for t in timestamps), dtype=np.float64, count=n)
+    ends = np.fromiter((_ms_or_nan(t.get("end_ms")) for t in timestamps), dtype=np.float64, count=n)
+    # Missing timestamps are NaN, and NaN comparisons are False, so those gaps never count.
+    return int(np.count_nonzero(starts[1:] - ends[:-1] > PAUSE_THRESHOLD_MS))
+
+
+def _save_behavior_event_later(**event: Any) -> None:
+    """Write a behavior event in the background so it stays off the response path."""
+    task = asyncio.create_task(db_service.save_behavior_event(**event))
+    # Keep a strong reference until done; the event loop only holds weak ones.
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def _mission_cache_key(user_id: str, mission_date: str) -> str:
+    return f"coach:mission:{user_id}:{mission_date}"
+
+
+@lru_cache(maxsize=2)
+def _speak_first_plan(comfort_mode: bool) -> dict:
+    # Static content: depends only on comfort_mode.
+    return coach_engine.build_speak_first_plan(comfort_mode=comfort_mode)
 
 
 def _validate_cron_secret(header_secret: Optional[str]) -> None:
@@ -142,59 +182,54 @@ async def _fetch_error_rows(session_ids: list[str]) -> list[dict]:
     if not session_ids:
         return []
 
-    # Preferred schema
-    try:
-        rows = (
-            db_service.client.table("error_instances")
-            .select("*")
-            .in_("session_id", session_ids)
-            .execute()
-        ).data or []
-        if rows:
-            return rows
-    except Exception:
-        pass
-
-    # Legacy fallback
+    table = await db_service.get_errors_table()
+    # Legacy detected_errors has no error_code; subcategory stands in for it.
+    code_column = "error_code" if table == "error_instances" else "subcategory"
     try:
         return (
-            db_service.client.table("detected_errors")
-            .select("*")
-            .in_("session_id", session_ids)
-            .execute()
+            await execute_query(
+                db_service.client.table(table)
+                .select(f"session_id,category,{code_column},created_at")
+                .in_("session_id", session_ids)
+            )
         ).data or []
     except Exception:
         return []
 
 
-async def _fetch_assets_map(user_id: str, session_ids: list[str]) -> dict[str, dict]:
+async def _fetch_assets_map(user_id: str, session_ids: list[str]) -> dict[str, Optional[str]]:
+    """Map session id -> recorded audio URL (the only asset the metrics use)."""
     if not session_ids:
         return {}
     try:
         rows = (
-            db_service.client.table("session_assets")
-            .select("session_id,audio_url,transcript_url,pdf_report_url")
-            .eq("user_id", user_id)
-            .in_("session_id", session_ids)
-            .execute()
+            await execute_query(
+                db_service.client.table("session_assets")
+                .select("session_id,audio_url")
+                .eq("user_id", user_id)
+                .in_("session_id", session_ids)
+            )
         ).data or []
     except Exception:
         rows = []
-    return {str(row.get("session_id")): row for row in rows if row.get("session_id")}
+    return {str(sid): row.get("audio_url") for row in rows if (sid := row.get("session_id"))}
 
 
 async def _build_session_metrics(
     sessions: list[dict],
     errors_by_session: dict[str, list[dict]],
-    assets_map: dict[str, dict],
+    assets_map: dict[str, Optional[str]],
 ) -> list[dict]:
     metrics = []
+    turns_by_session = await db_service.get_conversation_turns_bulk(
+        [str(s["id"]) for s in sessions if s.get("id")]
+    )
     for session in sessions:
         session_id = str(session.get("id"))
         if not session_id:
             continue
 
-        turns = await db_service.get_conversation_turns(session_id)
+        turns = turns_by_session.get(session_id, [])
         user_text_parts = []
         pause_count = 0
 
@@ -205,16 +240,7 @@ async def _build_session_metrics(
             if text:
                 user_text_parts.append(text)
 
-            timestamps = turn.get("word_timestamps") or []
-            if isinstance(timestamps, list) and len(timestamps) > 1:
-                for i in range(1, len(timestamps)):
-                    prev = timestamps[i - 1]
-                    curr = timestamps[i]
-                    prev_end = prev.get("end_ms")
-                    curr_start = curr.get("start_ms")
-                    if isinstance(prev_end, (int, float)) and isinstance(curr_start, (int, float)):
-                        if curr_start - prev_end > 700:
-                            pause_count += 1
+            pause_count += _count_pauses(turn.get("word_timestamps") or [])
 
         joined_text = " ".join(user_text_parts)
         word_count = _count_words(joined_text)
@@ -225,8 +251,10 @@ async def _build_session_metrics(
         wpm = round(word_count / duration_minutes, 2) if duration_seconds > 0 else float(word_count)
         filler_rate = round((filler_count / max(word_count, 1)) * 100, 2)
 
-        session_errors = errors_by_session.get(session_id, [])
-        grammar_errors = len([e for e in session_errors if str(e.get("category")).lower() == "grammar"])
+        category_counts = Counter(
+            str(e.get("category")).lower() for e in errors_by_session.get(session_id, ())
+        )
+        grammar_errors = category_counts["grammar"]
         grammar_accuracy = round(max(0.0, 100 - (grammar_errors / max(word_count, 1)) * 100), 2)
 
         scores = session.get("overall_scores") or {}
@@ -243,7 +271,7 @@ async def _build_session_metrics(
                 "pause_count": pause_count,
                 "grammar_accuracy": grammar_accuracy,
                 "overall_band": overall_band,
-                "audio_url": (assets_map.get(session_id) or {}).get("audio_url"),
+                "audio_url": assets_map.get(session_id),
             }
         )
 
@@ -251,85 +279,156 @@ async def _build_session_metrics(
 
 
 async def _persist_mnemonic_tasks(user_id: str, drills: list[dict]) -> dict:
-    created = 0
-    updated = 0
+    tasks = [
+        {
+            "error_code": drill["error_code"],
+            "content": {
+                "mnemonic": drill.get("mnemonic"),
+                "style": drill.get("style"),
+                "review_schedule_days": drill.get("review_schedule_days", [1, 3, 7]),
+                "category": drill.get("category"),
+            },
+        }
+        for drill in drills
+        if drill.get("error_code")
+    ]
+    if not tasks:
+        return {"created": 0, "updated": 0}
 
-    for drill in drills:
-        error_code = drill.get("error_code")
-        if not error_code:
-            continue
+    # One round-trip bulk upsert (migration_performance.sql)
+    try:
+        result = await execute_query(
+            db_service.client.rpc("upsert_mnemonic_tasks", {"p_user_id": user_id, "p_tasks": tasks})
+        )
+        if isinstance(result.data, dict):
+            return {
+                "created": int(result.data.get("created") or 0),
+                "updated": int(result.data.get("updated") or 0),
+            }
+    except Exception:
+        pass
+
+    # Fallback without the RPC: one existence query, then one bulk write each
+    # for updates and inserts.
+    content_by_code = {task["error_code"]: task["content"] for task in tasks}
+    try:
+        existing = await execute_query(
+            db_service.client.table("training_tasks")
+            .select("id,error_code")
+            .eq("user_id", user_id)
+            .eq("task_type", "mnemonic_drill")
+            .eq("status", "active")
+            .in_("error_code", list(content_by_code))
+        )
+    except Exception:
+        # Keep response resilient even if task persistence fails.
+        return {"created": 0, "updated": 0}
 
-        content = {
-            "mnemonic": drill.get("mnemonic"),
-            "style": drill.get("style"),
-            "review_schedule_days": drill.get("review_schedule_days", [1, 3, 7]),
-            "category": drill.get("category"),
+    existing_ids: dict[str, str] = {}
+    for row in existing.data or []:
+        existing_ids.setdefault(row["error_code"], row["id"])
+
+    due_at = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    schedule = {"next_due_at": due_at, "difficulty": 0.4, "interval_days": 1}
+    updates = [
+        {
+            "id": task_id,
+            "user_id": user_id,
+            "task_type": "mnemonic_drill",
+            "error_code": error_code,
+            "status": "active",
+            "content": content_by_code[error_code],
+            **schedule,
         }
+        for error_code, task_id in existing_ids.items()
+    ]
+    inserts = [
+        {
+            "user_id": user_id,
+            "task_type": "mnemonic_drill",
+            "error_code": error_code,
+            "content": content,
+            "ease_factor": 2.5,
+            "status": "active",
+            **schedule,
+        }
+        for error_code, content in content_by_code.items()
+        if error_code not in existing_ids
+    ]
+
+    created = 0
+    updated = 0
+    if updates:
         try:
-            existing = (
-                db_service.client.table("training_tasks")
-                .select("id")
-                .eq("user_id", user_id)
-                .eq("task_type", "mnemonic_drill")
-                .eq("error_code", error_code)
-                .eq("status", "active")
-                .limit(1)
-                .execute()
+            await execute_query(
+                db_service.client.table("training_tasks").upsert(updates, on_conflict="id")
             )
-            rows = existing.data or []
-            due_at = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
-
-            if rows:
-                db_service.client.table("training_tasks").update(
-                    {
-                        "content": content,
-                        "next_due_at": due_at,
-                        "difficulty": 0.4,
-                        "interval_days": 1,
-                    }
-                ).eq("id", rows[0]["id"]).execute()
-                updated += 1
-            else:
-                db_service.client.table("training_tasks").insert(
-                    {
-                        "user_id": user_id,
-                        "task_type": "mnemonic_drill",
-                        "error_code": error_code,
-                        "content": content,
-                        "difficulty": 0.4,
-                        "interval_days": 1,
-                        "ease_factor": 2.5,
-                        "next_due_at": due_at,
-                        "status": "active",
-                    }
-                ).execute()
-                created += 1
+            updated = len(updates)
         except Exception:
-            # Keep response resilient even if task persistence fails.
-            continue
+            pass
+    if inserts:
+        try:
+            await execute_query(db_service.client.table("training_tasks").insert(inserts))
+            created = len(inserts)
+        except Exception:
+            pass
 
     return {"created": created, "updated": updated}
 
 
-def _filter_sessions_by_days(sessions: list[dict], days: int) -> list[dict]:
-    since = datetime.now(timezone.utc) - timedelta(days=days)
-    filtered = []
-    for session in sessions:
-        dt = _parse_dt(session.get("created_at"))
-        if dt and dt >= since:
-            filtered.append(session)
-    return filtered
+async def _compute_proof_bundle(user_id: str, days: int) -> dict:
+    """
+    Sessions, session metrics and progress proof for the last `days` days.
+
+    Shared by /progress-proof, /share-card and /behavior-insights, which are
+    usually requested together; the result is cached briefly so the later
+    calls are free.
+    """
+    cache_key = f"coach:proof:{user_id}:{days}"
+    cached = await cache.get_json(cache_key)
+    if cached is not None:
+        return cached
+
+    sessions = await db_service.get_user_sessions_slim(
+        user_id, limit=140, created_after=_days_ago_iso(days)
+    )
+    session_ids = [str(s["id"]) for s in sessions if s.get("id")]
+    errors, assets_map = await asyncio.gather(
+        _fetch_error_rows(session_ids),
+        _fetch_assets_map(user_id, session_ids),
+    )
+
+    errors_by_session: dict[str, list[dict]] = defaultdict(list)
+    for error in errors:
+        sid = str(error.get("session_id") or "")
+        if sid:
+            errors_by_session[sid].append(error)
+
+    metrics = await _build_session_metrics(sessions, errors_by_session, assets_map)
+    bundle = {
+        "sessions": sessions,
+        "metrics": metrics,
+        "proof": coach_engine.build_progress_proof(metrics),
+    }
+    await cache.set_json(cache_key, bundle, PROOF_CACHE_TTL)
+    return bundle
 
 
 @router.get("/daily-mission")
 async def get_daily_mission(current_user: dict = Depends(get_current_user)):
-    profile = await _ensure_user_profile(current_user)
-    preferences = _preferences(profile)
     user_id = current_user["user_id"]
     today = datetime.now(timezone.utc).date().isoformat()
+    cache_key = _mission_cache_key(user_id, today)
+    cached = await cache.get_json(cache_key)
+    if cached is not None:
+        return cached
+
+    profile = await _ensure_user_profile(current_user)
+    preferences = _preferences(profile)
 
     stored = await db_service.get_coach_daily_mission(user_id, today)
     if stored and isinstance(stored.get("mission_payload"), dict):
+        await cache.set_json(cache_key, stored["mission_payload"], MISSION_CACHE_TTL)
         return stored["mission_payload"]
 
     mission_history_rows = await db_service.get_coach_mission_history(user_id, limit=60)
@@ -346,18 +445,19 @@ async def get_daily_mission(current_user: dict = Depends(get_current_user)):
             }
         )
 
-    prefs = dict(preferences)
-    coach_state = prefs.setdefault("coach", {})
+    # The profile is loaded fresh for this request, so it is mutated in place.
+    coach_state = preferences.setdefault("coach", {})
     if mission_history:
         coach_state["mission_history"] = mission_history[-60:]
+        coach_state["mission_stats"] = build_mission_stats(coach_state["mission_history"])
 
-    sessions = await db_service.get_user_sessions(user_id, limit=80)
+    sessions = await db_service.get_user_sessions_slim(user_id, limit=80)
     error_profiles = await db_service.get_user_error_profile(user_id)
 
-    mission = coach_engine.build_daily_mission(profile, sessions, error_profiles, prefs)
+    mission = coach_engine.build_daily_mission(profile, sessions, error_profiles, preferences)
 
     coach_state["latest_mission"] = mission
-    await _save_preferences(user_id, prefs)
+    await _save_preferences(user_id, preferences)
     await db_service.upsert_coach_daily_mission(
         user_id=user_id,
         mission_date=today,
@@ -365,6 +465,7 @@ async def get_daily_mission(current_user: dict = Depends(get_current_user)):
         difficulty=mission.get("difficulty"),
         best_hour=((mission.get("best_time_to_practice") or {}).get("hour")),
     )
+    await cache.set_json(cache_key, mission, MISSION_CACHE_TTL)
 
     return mission
 
@@ -398,7 +499,8 @@ async def complete_daily_mission(
         rating=body.rating,
         notes=body.notes,
     )
-    await db_service.save_behavior_event(
+    await cache.delete(_mission_cache_key(user_id, mission_date))
+    _save_behavior_event_later(
         user_id=user_id,
         event_type="mission_completed",
         payload={
@@ -432,8 +534,7 @@ async def submit_mnemonic_feedback(
     profile = await _ensure_user_profile(current_user)
     preferences = _preferences(profile)
 
-    prefs = dict(preferences)
-    coach = prefs.setdefault("coach", {})
+    coach = preferences.setdefault("coach", {})
     feedback_map = coach.setdefault("mnemonic_feedback", {})
     key = f"{body.error_code}:{body.style}"
     history = feedback_map.get(key, [])
@@ -447,7 +548,7 @@ async def submit_mnemonic_feedback(
     feedback_map[key] = history[-20:]
 
     user_id = current_user["user_id"]
-    await _save_preferences(user_id, prefs)
+    await _save_preferences(user_id, preferences)
     await db_service.save_mnemonic_feedback(
         user_id=user_id,
         error_code=body.error_code,
@@ -466,17 +567,24 @@ async def submit_mnemonic_feedback(
 
 @router.get("/skill-graph")
 async def get_skill_graph(current_user: dict = Depends(get_current_user)):
-    sessions = await db_service.get_user_sessions(current_user["user_id"], limit=120)
+    cache_key = f"coach:skill_graph:{current_user['user_id']}"
+    cached = await cache.get_json(cache_key)
+    if cached is not None:
+        return cached
+
+    sessions = await db_service.get_user_sessions_slim(current_user["user_id"], limit=120)
     session_ids = [str(s["id"]) for s in sessions if s.get("id")]
     errors = await _fetch_error_rows(session_ids)
-    return coach_engine.build_skill_graph(errors)
+    graph = coach_engine.build_skill_graph(errors)
+    await cache.set_json(cache_key, graph, SKILL_GRAPH_CACHE_TTL)
+    return graph
 
 
 @router.get("/memory")
 async def get_coach_memory(current_user: dict = Depends(get_current_user)):
     profile = await _ensure_user_profile(current_user)
     preferences = _preferences(profile)
-    sessions = await db_service.get_user_sessions(current_user["user_id"], limit=20)
+    sessions = await db_service.get_user_sessions_slim(current_user["user_id"], limit=20)
     return coach_engine.build_memory(profile, sessions, preferences)
 
 
@@ -490,9 +598,10 @@ async def update_coach_memory(
     patch = body.model_dump(exclude_none=True)
     updated = coach_engine.update_memory(preferences, patch)
     await _save_preferences(current_user["user_id"], updated)
-    sessions = await db_service.get_user_sessions(current_user["user_id"], limit=20)
-    refreshed_profile = await db_service.get_user_profile(current_user["user_id"]) or profile
-    return coach_engine.build_memory(refreshed_profile, sessions, _preferences(refreshed_profile))
+    sessions = await db_service.get_user_sessions_slim(current_user["user_id"], limit=20)
+    # The saved preferences are already in hand; no need to re-read the profile.
+    refreshed_profile = {**profile, "preferences": updated}
+    return coach_engine.build_memory(refreshed_profile, sessions, updated)
 
 
 @router.delete("/memory")
@@ -509,21 +618,8 @@ async def get_progress_proof(
     days: int = Query(30, ge=7, le=180),
     current_user: dict = Depends(get_current_user),
 ):
-    sessions = await db_service.get_user_sessions(current_user["user_id"], limit=140)
-    sessions = _filter_sessions_by_days(sessions, days)
-    session_ids = [str(s["id"]) for s in sessions if s.get("id")]
-    errors = await _fetch_error_rows(session_ids)
-
-    errors_by_session: dict[str, list[dict]] = defaultdict(list)
-    for error in errors:
-        sid = str(error.get("session_id") or "")
-        if sid:
-            errors_by_session[sid].append(error)
-
-    assets_map = await _fetch_assets_map(current_user["user_id"], session_ids)
-    metrics = await _build_session_metrics(sessions, errors_by_session, assets_map)
-    proof = coach_engine.build_progress_proof(metrics)
-    return {"proof": proof, "session_count": len(metrics)}
+    bundle = await _compute_proof_bundle(current_user["user_id"], days)
+    return {"proof": bundle["proof"], "session_count": len(bundle["metrics"])}
 
 
 @router.get("/speak-first")
@@ -532,7 +628,7 @@ async def get_speak_first_plan(
     current_user: dict = Depends(get_current_user),
 ):
     _ = current_user
-    return coach_engine.build_speak_first_plan(comfort_mode=comfort_mode)
+    return _speak_first_plan(comfort_mode)
 
 
 @router.post("/public/diagnosis")
@@ -555,7 +651,7 @@ async def quick_free_diagnosis(
     transcript = (body.transcript or "").strip()
 
     if not transcript:
-        sessions = await db_service.get_user_sessions(current_user["user_id"], limit=5)
+        sessions = await db_service.get_user_sessions_slim(current_user["user_id"], limit=5)
         latest = sessions[0] if sessions else None
         if latest:
             turns = await db_service.get_conversation_turns(str(latest["id"]))
@@ -580,21 +676,11 @@ async def get_share_card(
     days: int = Query(30, ge=7, le=180),
     current_user: dict = Depends(get_current_user),
 ):
-    profile = await _ensure_user_profile(current_user)
-    sessions = await db_service.get_user_sessions(current_user["user_id"], limit=140)
-    sessions = _filter_sessions_by_days(sessions, days)
-    session_ids = [str(s["id"]) for s in sessions if s.get("id")]
-    errors = await _fetch_error_rows(session_ids)
-
-    errors_by_session: dict[str, list[dict]] = defaultdict(list)
-    for error in errors:
-        sid = str(error.get("session_id") or "")
-        if sid:
-            errors_by_session[sid].append(error)
-
-    assets_map = await _fetch_assets_map(current_user["user_id"], session_ids)
-    metrics = await _build_session_metrics(sessions, errors_by_session, assets_map)
-    proof = coach_engine.build_progress_proof(metrics)
+    profile, bundle = await asyncio.gather(
+        _ensure_user_profile(current_user),
+        _compute_proof_bundle(current_user["user_id"], days),
+    )
+    proof = bundle["proof"]
     card = coach_engine.build_share_card(proof, profile)
     return {"card": card, "proof_status": proof.get("status")}
 
@@ -604,36 +690,22 @@ async def get_behavior_insights(
     days: int = Query(30, ge=7, le=180),
     current_user: dict = Depends(get_current_user),
 ):
-    profile = await _ensure_user_profile(current_user)
+    profile, bundle = await asyncio.gather(
+        _ensure_user_profile(current_user),
+        _compute_proof_bundle(current_user["user_id"], days),
+    )
     preferences = _preferences(profile)
     coach_state = preferences.get("coach", {}) if isinstance(preferences, dict) else {}
     mission_history = coach_state.get("mission_history", [])
 
-    sessions = await db_service.get_user_sessions(current_user["user_id"], limit=100)
-    sessions = _filter_sessions_by_days(sessions, days)
-    session_ids = [str(s["id"]) for s in sessions if s.get("id")]
-    errors = await _fetch_error_rows(session_ids)
-    errors_by_session: dict[str, list[dict]] = defaultdict(list)
-    for error in errors:
-        sid = str(error.get("session_id") or "")
-        if sid:
-            errors_by_session[sid].append(error)
-
-    assets_map = await _fetch_assets_map(current_user["user_id"], session_ids)
-    metrics = await _build_session_metrics(sessions, errors_by_session, assets_map)
-    progress_proof = coach_engine.build_progress_proof(metrics)
-    insights = coach_engine.build_behavior_insights(sessions, mission_history, progress_proof)
+    insights = coach_engine.build_behavior_insights(
+        bundle.get("sessions", []), mission_history, bundle["proof"]
+    )
 
-    completion_rate = None
-    if mission_history:
-        recent = mission_history[-14:]
-        completion_rate = round(
-            sum(float(item.get("success_rate", 0.0)) for item in recent) / len(recent),
-            2,
-        )
+    completion_rate = mission_completion_rate(coach_state)
 
     if insights.get("insights"):
-        await db_service.save_behavior_event(
+        _save_behavior_event_later(
             user_id=current_user["user_id"],
             event_type="insight_generated",
             payload={"top_risk": insights["insights"][0].get("risk"), "days": days},
@@ -1,16 +1,32 @@
 """
 SpeakMate AI - Feedback Routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, BackgroundTasks
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, RedirectResponse
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from uuid import UUID
+import asyncio
+import logging
 import os
+import time
 
+from app.core.cache import cache
+from app.core.config import settings
+from app.core.http_cache import cache_headers, etag_matches, not_modified, session_etag
 from app.core.security import get_current_user
-from app.db.supabase import db_service
+from app.db.supabase import (
+    WEEKLY_SUMMARY_CACHE_TTL,
+    db_service,
+    execute_query,
+    weekly_summary_cache_key,
+)
+from app.middleware.monitoring import MetricNames, metrics
 from app.models.schemas import SessionFeedback, PDFReportRequest, PDFReportResponse
-from app.services.pdf import PDFGenerator
+from app.services.pdf import pdf_generator
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/feedback", tags=["feedback"])
 
@@ -18,11 +34,22 @@ router = APIRouter(prefix="/feedback", tags=["feedback"])
 @router.get("/{session_id}", response_model=dict)
 async def get_session_feedback(
     session_id: UUID,
+    request: Request,
     current_user: dict = Depends(get_current_user)
 ):
     """Get comprehensive feedback for a session."""
-    # Verify session ownership
-    session = await db_service.get_session(str(session_id))
+    if_none_match = request.headers.get("if-none-match")
+    errors = conversation = None
+    if if_none_match:
+        # Conditional request: check the session alone so a match skips the other reads
+        session = await db_service.get_session(str(session_id))
+    else:
+        # Fetch the session and its data together, then verify ownership
+        session, errors, conversation = await asyncio.gather(
+            db_service.get_session(str(session_id)),
+            db_service.get_session_errors(str(session_id)),
+            db_service.get_conversation_turns(str(session_id)),
+        )
     
     if not session:
         raise HTTPException(
@@ -36,41 +63,137 @@ async def get_session_feedback(
             detail="Not authorized"
         )
     
-    # Get all related data
-    errors = await db_service.get_session_errors(str(session_id))
-    conversation = await db_service.get_conversation_turns(str(session_id))
+    etag = session_etag(session)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    if errors is None:
+        errors, conversation = await asyncio.gather(
+            db_service.get_session_errors(str(session_id)),
+            db_service.get_conversation_turns(str(session_id)),
+        )
     
     # Group errors by category
-    error_summary = {}
+    error_summary = defaultdict(list)
     for error in errors:
-        category = error.get("category", "other")
-        if category not in error_summary:
-            error_summary[category] = []
-        error_summary[category].append(error)
+        error_summary[error.get("category", "other")].append(error)
     
-    return {
-        "session_id": str(session_id),
-        "mode": session.get("mode"),
-        "topic": session.get("topic"),
-        "duration_seconds": session.get("duration_seconds"),
-        "overall_scores": session.get("overall_scores"),
-        "total_errors": len(errors),
-        "errors_by_category": error_summary,
-        "conversation_turns": len(conversation),
-        "errors": errors
-    }
+    # Rows come back from Supabase already JSON-safe; skip jsonable_encoder
+    return ORJSONResponse(
+        {
+            "session_id": str(session_id),
+            "mode": session.get("mode"),
+            "topic": session.get("topic"),
+            "duration_seconds": session.get("duration_seconds"),
+            "overall_scores": session.get("overall_scores"),
+            "total_errors": len(errors),
+            "errors_by_category": error_summary,
+            "conversation_turns": len(conversation),
+            "errors": errors
+        },
+        headers=cache_headers(etag) if etag else None,
+    )
+
+
+PDF_LOCK_STALE_SECONDS = 600
+PDF_SIGNED_URL_TTL = 300
+
+# Rendering holds the whole story in memory; cap concurrent builds so a burst
+# of requests queues instead of exhausting the worker.
+_pdf_semaphore = asyncio.Semaphore(settings.PDF_MAX_CONCURRENCY)
+_pdf_queue_depth = 0
+
+
+def _lock_is_fresh(lock_path: str) -> bool:
+    """True if the lock exists and is younger than PDF_LOCK_STALE_SECONDS."""
+    try:
+        age = time.time() - os.path.getmtime(lock_path)
+    except FileNotFoundError:
+        return False
+    return age < PDF_LOCK_STALE_SECONDS
+
+
+def _acquire_pdf_lock(session_id: str) -> bool:
+    """Create reports/{id}.lock; False if a fresh generation is already running."""
+    os.makedirs("reports", exist_ok=True)
+    lock_path = f"reports/{session_id}.lock"
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        if _lock_is_fresh(lock_path):
+            return False
+        # Left behind by a crashed worker; take it over
+        try:
+            os.utime(lock_path)
+        except FileNotFoundError:
+            return _acquire_pdf_lock(session_id)
+        return True
+    os.close(fd)
+    return True
 
 
-@router.post("/{session_id}/pdf", response_model=dict)
+def _pdf_pending(session_id: str) -> bool:
+    lock_path = f"reports/{session_id}.lock"
+    if _lock_is_fresh(lock_path):
+        return True
+    # A stale lock means the build died; drop it so the download can resolve
+    try:
+        os.remove(lock_path)
+    except FileNotFoundError:
+        pass
+    return False
+
+
+def _pdf_object_path(session_id: str) -> str:
+    return f"reports/{session_id}.pdf"
+
+
+async def _generate_pdf_in_background(session_id: str, report_data: dict) -> None:
+    global _pdf_queue_depth
+    _pdf_queue_depth += 1
+    metrics.set_gauge(MetricNames.PDF_QUEUE_DEPTH, _pdf_queue_depth)
+    try:
+        async with _pdf_semaphore:
+            pdf_path = await pdf_generator.generate_session_report(report_data)
+        try:
+            # Object storage lets any replica (or the CDN) serve the download
+            await db_service.upload_storage_file(
+                _pdf_object_path(session_id), pdf_path, "application/pdf"
+            )
+        except Exception as e:
+            logger.warning(f"PDF upload failed for session {session_id}; serving from disk: {e}")
+            # Downloads prefer storage, so an older stored report would win
+            # over the new file on disk
+            try:
+                await db_service.delete_storage_file(_pdf_object_path(session_id))
+            except Exception as e:
+                logger.error(f"Could not remove stale PDF for session {session_id} from storage: {e}")
+    except Exception as e:
+        logger.error(f"PDF generation failed for session {session_id}: {e}")
+    finally:
+        _pdf_queue_depth -= 1
+        metrics.set_gauge(MetricNames.PDF_QUEUE_DEPTH, _pdf_queue_depth)
+        try:
+            os.remove(f"reports/{session_id}.lock")
+        except FileNotFoundError:
+            pass
+
+
+@router.post("/{session_id}/pdf", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
 async def generate_pdf_report(
     session_id: UUID,
     request: PDFReportRequest,
+    http_request: Request,
     background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user)
 ):
-    """Generate a PDF report for a session."""
-    # Verify session ownership
-    session = await db_service.get_session(str(session_id))
+    """Start PDF report generation for a session; poll the download URL for the file."""
+    # Fetch the session, report data and user profile together, then verify ownership
+    session, user_profile, errors = await asyncio.gather(
+        db_service.get_session(str(session_id)),
+        db_service.get_user_profile(current_user["user_id"]),
+        db_service.get_session_errors(str(session_id)),
+    )
     
     if not session:
         raise HTTPException(
@@ -84,49 +207,74 @@ async def generate_pdf_report(
             detail="Not authorized"
         )
     
-    # Get user profile for the report
-    user_profile = await db_service.get_user_profile(current_user["user_id"])
-    
-    # Get session data
-    errors = await db_service.get_session_errors(str(session_id))
-    conversation = await db_service.get_conversation_turns(str(session_id))
-    
-    # Generate PDF
-    pdf_generator = PDFGenerator()
-    report_data = {
-        "session": session,
-        "user": user_profile,
-        "errors": errors,
-        "conversation": conversation,
-        "include_details": request.include_details
-    }
-    
-    # Generate in background for large reports
-    pdf_path = await pdf_generator.generate_session_report(report_data)
+    # A second submission while one is running shares the same result
+    if _acquire_pdf_lock(str(session_id)):
+        # The report does not render turns, so they are not loaded
+        report_data = {
+            "session": session,
+            "user": user_profile,
+            "errors": errors,
+            "include_details": request.include_details
+        }
+        background_tasks.add_task(_generate_pdf_in_background, str(session_id), report_data)
     
     return {
-        "message": "PDF report generated",
-        "report_path": pdf_path,
+        "status": "pending",
+        "message": "PDF report generation started",
+        "poll_url": http_request.url_for("download_pdf_report", session_id=str(session_id)).path,
         "session_id": str(session_id)
     }
 
 
-@router.get("/{session_id}/pdf/download")
+def _parse_byte_range(range_header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """Parse a single `bytes=start-end` range; None means serve the whole file."""
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_str, sep, end_str = range_header[len("bytes="):].strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if not start_str:
+            # Suffix range: the last N bytes
+            length = int(end_str)
+            if length <= 0:
+                return None
+            return max(size - length, 0), size - 1
+        start = int(start_str)
+        end = int(end_str) if end_str else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        # Unsatisfiable; the caller answers 416
+        return start, start
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _read_file_range(path: str, start: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(length)
+
+
+@router.api_route("/{session_id}/pdf/download", methods=["GET", "HEAD"])
 async def download_pdf_report(
     session_id: UUID,
+    request: Request,
     current_user: dict = Depends(get_current_user)
 ):
-    """Download the generated PDF report."""
+    """Download the generated PDF report (supports HEAD and single byte ranges)."""
     # Verify session ownership
-    session = await db_service.get_session(str(session_id))
+    owner = await db_service.get_session_owner(str(session_id))
     
-    if not session:
+    if not owner:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found"
         )
     
-    if session.get("user_id") != current_user["user_id"]:
+    if owner != current_user["user_id"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized"
@@ -135,17 +283,105 @@ async def download_pdf_report(
     # Check if PDF exists
     pdf_path = f"reports/{session_id}.pdf"
     
-    if not os.path.exists(pdf_path):
+    if _pdf_pending(str(session_id)):
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={"status": "pending", "session_id": str(session_id)}
+        )
+    
+    # Prefer a signed storage URL so bytes are not streamed through the worker
+    try:
+        signed_url = await db_service.create_signed_storage_url(
+            _pdf_object_path(str(session_id)), PDF_SIGNED_URL_TTL
+        )
+    except Exception:
+        signed_url = None
+    if signed_url:
+        return RedirectResponse(signed_url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    
+    # Reports generated before storage upload, or when storage is unavailable
+    try:
+        stat_result = os.stat(pdf_path)
+    except FileNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="PDF report not found. Please generate it first."
         )
     
-    return FileResponse(
-        pdf_path,
+    filename = f"speakmate_report_{session_id}.pdf"
+    size = stat_result.st_size
+    byte_range = None
+    if request.method == "GET":
+        byte_range = _parse_byte_range(request.headers.get("range"), size)
+    
+    if byte_range is None:
+        # FileResponse answers HEAD with headers only; the cached stat sets Content-Length
+        return FileResponse(
+            pdf_path,
+            media_type="application/pdf",
+            filename=filename,
+            headers={"Accept-Ranges": "bytes"},
+            stat_result=stat_result
+        )
+    
+    start, end = byte_range
+    if start >= size:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    
+    chunk = await asyncio.to_thread(_read_file_range, pdf_path, start, end - start + 1)
+    return Response(
+        content=chunk,
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
         media_type="application/pdf",
-        filename=f"speakmate_report_{session_id}.pdf"
+        headers={
+            "Accept-Ranges": "bytes",
+            "Content-Range": f"bytes {start}-{end}/{size}",
+            "Content-Disposition": f'attachment; filename="{filename}"',
+        }
+    )
+
+
+WEEKLY_SUMMARY_DAYS = 7
+WEEKLY_TOP_ISSUES = 3
+
+
+async def _load_weekly_summary(user_id: str, days: int) -> dict:
+    """Session totals and top error profile entries for the last `days` days."""
+    # One round-trip aggregate (migration_performance.sql)
+    try:
+        result = await execute_query(
+            db_service.client.rpc("weekly_summary", {"p_user_id": user_id, "p_days": days})
+        )
+        if isinstance(result.data, dict):
+            return result.data
+    except Exception:
+        pass
+    
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    sessions, error_profile = await asyncio.gather(
+        db_service.get_user_sessions_slim(user_id, limit=50, created_after=since),
+        db_service.get_user_error_profile(user_id, limit=WEEKLY_TOP_ISSUES),
     )
+    
+    scores = [(s.get("overall_scores") or {}).get("overall_band") for s in sessions]
+    scores = [score for score in scores if score is not None]
+    
+    return {
+        "sessions_count": len(sessions),
+        "total_minutes": sum(s.get("duration_seconds") or 0 for s in sessions) // 60,
+        "average_band": sum(scores) / len(scores) if scores else None,
+        "top_issues": [
+            {
+                "category": e.get("category"),
+                "subcategory": e.get("subcategory"),
+                "count": e.get("occurrence_count")
+            }
+            for e in error_profile
+        ],
+    }
 
 
 @router.get("/summary/weekly", response_model=dict)
@@ -153,36 +389,20 @@ async def get_weekly_summary(
     current_user: dict = Depends(get_current_user)
 ):
     """Get weekly progress summary."""
-    sessions = await db_service.get_user_sessions(current_user["user_id"], limit=50)
-    error_profile = await db_service.get_user_error_profile(current_user["user_id"])
+    cache_key = weekly_summary_cache_key(current_user["user_id"])
+    cached = await cache.get_json(cache_key)
+    if cached is not None:
+        return cached
     
-    # Calculate weekly stats
-    # This is a simplified version - in production, filter by actual dates
-    recent_sessions = sessions[:7]
+    summary = await _load_weekly_summary(current_user["user_id"], WEEKLY_SUMMARY_DAYS)
     
-    total_minutes = sum(s.get("duration_seconds", 0) for s in recent_sessions) // 60
-    
-    # Get scores trend
-    scores = [s.get("overall_scores", {}).get("overall_band") for s in recent_sessions]
-    scores = [s for s in scores if s is not None]
-    
-    avg_score = sum(scores) / len(scores) if scores else 0
-    
-    # Top issues
-    top_issues = [
-        {
-            "category": e.get("category"),
-            "subcategory": e.get("subcategory"),
-            "count": e.get("occurrence_count")
-        }
-        for e in error_profile[:3]
-    ]
-    
-    return {
+    result = {
         "period": "weekly",
-        "sessions_count": len(recent_sessions),
-        "total_practice_minutes": total_minutes,
-        "average_band_score": round(avg_score, 1),
-        "top_issues": top_issues,
+        "sessions_count": summary["sessions_count"],
+        "total_practice_minutes": summary["total_minutes"],
+        "average_band_score": round(summary["average_band"] or 0, 1),
+        "top_issues": summary["top_issues"],
         "recommendation": "Focus on your most frequent errors for maximum improvement."
     }
+    await cache.set_json(cache_key, result, WEEKLY_SUMMARY_CACHE_TTL)
+    return result
@@ -1,10 +1,12 @@
 """
 SpeakMate AI - Session Routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from typing import List, Optional
 from uuid import UUID
+import asyncio
 
+from app.core.http_cache import cache_headers, etag_matches, not_modified, session_etag
 from app.core.security import get_current_user
 from app.db.supabase import db_service
 from app.models.schemas import (
@@ -45,20 +47,18 @@ async def get_user_sessions(
     current_user: dict = Depends(get_current_user)
 ):
     """Get user's recent sessions."""
-    sessions = await db_service.get_user_sessions(
+    return await db_service.get_user_sessions(
         current_user["user_id"],
-        limit=limit
+        limit=limit,
+        mode=mode.value if mode else None
     )
-    
-    if mode:
-        sessions = [s for s in sessions if s.get("mode") == mode.value]
-    
-    return sessions
 
 
 @router.get("/{session_id}", response_model=dict)
 async def get_session(
     session_id: UUID,
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user)
 ):
     """Get a specific session."""
@@ -77,17 +77,34 @@ async def get_session(
             detail="Not authorized to access this session"
         )
     
+    etag = session_etag(session)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    if etag:
+        response.headers.update(cache_headers(etag))
+    
     return session
 
 
 @router.get("/{session_id}/conversation", response_model=List[dict])
 async def get_session_conversation(
     session_id: UUID,
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user)
 ):
     """Get conversation turns for a session."""
-    # Verify session ownership first
-    session = await db_service.get_session(str(session_id))
+    if_none_match = request.headers.get("if-none-match")
+    turns = None
+    if if_none_match:
+        # Conditional request: check the session alone so a match skips the turns read
+        session = await db_service.get_session(str(session_id))
+    else:
+        # Fetch both together; nothing is returned until ownership is verified
+        session, turns = await asyncio.gather(
+            db_service.get_session(str(session_id)),
+            db_service.get_conversation_turns(str(session_id)),
+        )
     
     if not session:
         raise HTTPException(
@@ -101,7 +118,14 @@ async def get_session_conversation(
             detail="Not authorized"
         )
     
-    turns = await db_service.get_conversation_turns(str(session_id))
+    etag = session_etag(session)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    if etag:
+        response.headers.update(cache_headers(etag))
+    
+    if turns is None:
+        turns = await db_service.get_conversation_turns(str(session_id))
     return turns
 
 
@@ -111,22 +135,24 @@ async def get_session_errors(
     current_user: dict = Depends(get_current_user)
 ):
     """Get detected errors for a session."""
-    # Verify session ownership first
-    session = await db_service.get_session(str(session_id))
+    # Fetch both together; nothing is returned until ownership is verified
+    owner, errors = await asyncio.gather(
+        db_service.get_session_owner(str(session_id)),
+        db_service.get_session_errors(str(session_id)),
+    )
     
-    if not session:
+    if not owner:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found"
         )
     
-    if session.get("user_id") != current_user["user_id"]:
+    if owner != current_user["user_id"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized"
         )
     
-    errors = await db_service.get_session_errors(str(session_id))
     return errors
 
 
@@ -137,15 +163,15 @@ async def end_session(
     current_user: dict = Depends(get_current_user)
 ):
     """End a session and save final duration."""
-    session = await db_service.get_session(str(session_id))
+    owner = await db_service.get_session_owner(str(session_id))
     
-    if not session:
+    if not owner:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found"
         )
     
-    if session.get("user_id") != current_user["user_id"]:
+    if owner != current_user["user_id"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized"
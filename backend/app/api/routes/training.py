@@ -4,23 +4,36 @@ SpeakMate AI - Training Routes (Production)
 Endpoints for personalized training system.
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import ORJSONResponse
+from collections import Counter, defaultdict
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from uuid import UUID
 from pydantic import BaseModel
 
 from app.core.security import get_current_user
-from app.db.supabase import db_service
+from app.db.supabase import db_service, execute_query
 from app.services.training_engine import training_engine
 
 router = APIRouter(prefix="/training", tags=["training"])
 
 
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 class TaskCompletionRequest(BaseModel):
     was_correct: Optional[bool] = None
     score: Optional[float] = None
 
 
+# List view: schedule and stats only; the `content` blob is fetched per task.
+TASK_LIST_COLUMNS = (
+    "id,task_type,error_code,status,difficulty,interval_days,ease_factor,repetition_count,"
+    "next_due_at,last_practiced_at,last_result,times_practiced,times_correct,created_at"
+)
+
+
 @router.get("/tasks")
 async def get_training_tasks(
     task_status: Optional[str] = Query(None, alias="status", description="Filter by status"),
@@ -35,25 +48,31 @@ async def get_training_tasks(
     """
     try:
         user_id = current_user["user_id"]
+        now_iso = _utcnow().isoformat()
 
         client = db_service.client
         
-        query = client.table("training_tasks").select("*").eq("user_id", user_id)
-        
-        if task_status:
-            query = query.eq("status", task_status)
+        def build_query(columns: str):
+            query = client.table("training_tasks").select(columns).eq("user_id", user_id)
+            
+            if task_status:
+                query = query.eq("status", task_status)
+            
+            if due_only:
+                query = query.lte("next_due_at", now_iso)
+            
+            return query.order("next_due_at").limit(limit)
         
-        if due_only:
-            query = query.lte("next_due_at", datetime.utcnow().isoformat())
+        try:
+            result = await execute_query(build_query(TASK_LIST_COLUMNS))
+        except Exception:
+            # Practice counters are added by migration_performance.sql
+            result = await execute_query(build_query("*"))
         
-        query = query.order("next_due_at").limit(limit)
-        
-        result = query.execute()
-        
-        return {
+        return ORJSONResponse({
             "tasks": result.data,
             "count": len(result.data)
-        }
+        })
         
     except Exception as e:
         raise HTTPException(
@@ -71,7 +90,7 @@ async def get_task(
     try:
         client = db_service.client
         
-        result = client.table("training_tasks").select("*").eq("id", str(task_id)).single().execute()
+        result = await execute_query(client.table("training_tasks").select("*").eq("id", str(task_id)).single())
         
         if not result.data:
             raise HTTPException(
@@ -112,8 +131,43 @@ async def complete_task(
     try:
         client = db_service.client
         
+        resolved_was_correct = was_correct
+        if resolved_was_correct is None and payload is not None and payload.was_correct is not None:
+            resolved_was_correct = payload.was_correct
+
+        if resolved_was_correct is None and payload is not None and payload.score is not None:
+            # Accept both 0..1 and 0..100 style scores from clients.
+            threshold = 0.7 if payload.score <= 1 else 70
+            resolved_was_correct = payload.score >= threshold
+
+        if resolved_was_correct is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Either was_correct or score must be provided"
+            )
+
+        # Read, SM-2 schedule and write in one statement (migration_performance.sql)
+        try:
+            rpc_result = await execute_query(client.rpc("sm2_update", {
+                "p_task_id": str(task_id),
+                "p_user_id": current_user["user_id"],
+                "p_was_correct": resolved_was_correct,
+            }))
+            rpc_rows = rpc_result.data
+        except Exception:
+            rpc_rows = None
+
+        if rpc_rows:
+            updated_task = rpc_rows[0]
+            return {
+                "status": "completed",
+                "was_correct": resolved_was_correct,
+                "next_due_at": updated_task["next_due_at"],
+                "interval_days": updated_task["interval_days"]
+            }
+
         # Get current task
-        result = client.table("training_tasks").select("*").eq("id", str(task_id)).single().execute()
+        result = await execute_query(client.table("training_tasks").select("*").eq("id", str(task_id)).single())
         
         if not result.data:
             raise HTTPException(
@@ -130,26 +184,11 @@ async def complete_task(
                 detail="Not authorized"
             )
         
-        resolved_was_correct = was_correct
-        if resolved_was_correct is None and payload is not None and payload.was_correct is not None:
-            resolved_was_correct = payload.was_correct
-
-        if resolved_was_correct is None and payload is not None and payload.score is not None:
-            # Accept both 0..1 and 0..100 style scores from clients.
-            threshold = 0.7 if payload.score <= 1 else 70
-            resolved_was_correct = payload.score >= threshold
-
-        if resolved_was_correct is None:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Either was_correct or score must be provided"
-            )
-
         # Calculate next review using SM-2
         updated_task = training_engine.calculate_next_review(task, resolved_was_correct)
         
         # Update in database
-        client.table("training_tasks").update({
+        await execute_query(client.table("training_tasks").update({
             "interval_days": updated_task["interval_days"],
             "ease_factor": updated_task["ease_factor"],
             "repetition_count": updated_task["repetition_count"],
@@ -157,7 +196,7 @@ async def complete_task(
             "last_practiced_at": updated_task["last_practiced_at"],
             "times_practiced": task.get("times_practiced", 0) + 1,
             "times_correct": task.get("times_correct", 0) + (1 if resolved_was_correct else 0)
-        }).eq("id", str(task_id)).execute()
+        }).eq("id", str(task_id)))
         
         return {
             "status": "completed",
@@ -175,6 +214,45 @@ async def complete_task(
         )
 
 
+RECENT_SESSION_LIMIT = 10
+
+
+async def _recent_error_counts(user_id: str) -> dict:
+    """Error counts by code across the user's most recent sessions."""
+    client = db_service.client
+
+    # One round-trip aggregate (migration_performance.sql)
+    try:
+        result = await execute_query(
+            client.rpc(
+                "get_recent_error_profile",
+                {"p_user_id": user_id, "p_session_limit": RECENT_SESSION_LIMIT},
+            )
+        )
+        if isinstance(result.data, list):
+            return {row["error_code"]: int(row["count"]) for row in result.data}
+    except Exception:
+        pass
+
+    recent_sessions = await execute_query(
+        client.table("sessions")
+        .select("id")
+        .eq("user_id", user_id)
+        .order("created_at", desc=True)
+        .limit(RECENT_SESSION_LIMIT)
+    )
+    session_ids = [row["id"] for row in (recent_sessions.data or []) if row.get("id")]
+    if not session_ids:
+        return {}
+
+    errors_result = await execute_query(
+        client.table("error_instances")
+        .select("error_code")
+        .in_("session_id", session_ids)
+    )
+    return dict(Counter(row.get("error_code") or "GRAM_OTHER" for row in errors_result.data or []))
+
+
 @router.get("/plan")
 async def get_training_plan(
     available_minutes: int = Query(15, description="Available time for practice"),
@@ -186,32 +264,7 @@ async def get_training_plan(
     try:
         user_id = current_user["user_id"]
 
-        client = db_service.client
-
-        recent_sessions = (
-            client.table("sessions")
-            .select("id")
-            .eq("user_id", user_id)
-            .order("created_at", desc=True)
-            .limit(10)
-            .execute()
-        )
-        session_ids = [row["id"] for row in (recent_sessions.data or []) if row.get("id")]
-
-        errors_result = None
-        if session_ids:
-            errors_result = (
-                client.table("error_instances")
-                .select("category, error_code")
-                .in_("session_id", session_ids)
-                .execute()
-            )
-        
-        # Build error profile
-        error_profile = {"by_code": {}}
-        for error in errors_result.data if errors_result and errors_result.data else []:
-            code = error.get("error_code", "GRAM_OTHER")
-            error_profile["by_code"][code] = error_profile["by_code"].get(code, 0) + 1
+        error_profile = {"by_code": await _recent_error_counts(user_id)}
         
         # Generate plan
         plan = training_engine.generate_session_plan(error_profile, available_minutes)
@@ -228,6 +281,49 @@ async def get_training_plan(
         )
 
 
+async def _load_progress_summary(user_id: str, since: str) -> dict:
+    """Practice totals and per-category breakdown for tasks practiced since `since`."""
+    client = db_service.client
+
+    # One round-trip aggregate (migration_performance.sql)
+    try:
+        result = await execute_query(
+            client.rpc("progress_summary", {"p_user_id": user_id, "p_since": since})
+        )
+        if isinstance(result.data, dict):
+            return result.data
+    except Exception:
+        pass
+
+    result = await execute_query(client.table("training_tasks").select(
+        "error_code, times_practiced, times_correct, last_practiced_at"
+    ).eq("user_id", user_id).gte("last_practiced_at", since))
+    
+    tasks = result.data or []
+    
+    # Totals and per-category breakdown in one pass
+    total_practiced = 0
+    total_correct = 0
+    by_category = defaultdict(lambda: {"practiced": 0, "correct": 0})
+    for task in tasks:
+        code = task.get("error_code") or "GRAM_OTHER"
+        prefix, sep, _ = code.partition("_")
+        practiced = task.get("times_practiced") or 0
+        correct = task.get("times_correct") or 0
+        stats = by_category[prefix if sep else "OTHER"]
+        stats["practiced"] += practiced
+        stats["correct"] += correct
+        total_practiced += practiced
+        total_correct += correct
+    
+    return {
+        "total_practiced": total_practiced,
+        "total_correct": total_correct,
+        "by_category": dict(by_category),
+        "tasks_count": len(tasks),
+    }
+
+
 @router.get("/progress")
 async def get_training_progress(
     days: int = Query(30, description="Number of days to include"),
@@ -237,42 +333,21 @@ async def get_training_progress(
     try:
         user_id = current_user["user_id"]
 
-        from datetime import timedelta
-
-        client = db_service.client
-        
-        since = (datetime.utcnow() - timedelta(days=days)).isoformat()
-        
-        # Get completed tasks
-        result = client.table("training_tasks").select(
-            "error_code, times_practiced, times_correct, last_practiced_at"
-        ).eq("user_id", user_id).gte("last_practiced_at", since).execute()
-        
-        tasks = result.data or []
-        
-        # Calculate stats
-        total_practiced = sum(t.get("times_practiced", 0) for t in tasks)
-        total_correct = sum(t.get("times_correct", 0) for t in tasks)
+        since = (_utcnow() - timedelta(days=days)).isoformat()
+        summary = await _load_progress_summary(user_id, since)
+        total_practiced = summary["total_practiced"]
+        total_correct = summary["total_correct"]
+        by_category = summary["by_category"]
         accuracy = total_correct / total_practiced if total_practiced > 0 else 0
         
-        # Group by error code
-        by_category = {}
-        for task in tasks:
-            code = task.get("error_code", "GRAM_OTHER")
-            category = code.split("_")[0] if "_" in code else "OTHER"
-            if category not in by_category:
-                by_category[category] = {"practiced": 0, "correct": 0}
-            by_category[category]["practiced"] += task.get("times_practiced", 0)
-            by_category[category]["correct"] += task.get("times_correct", 0)
-        
-        return {
+        return ORJSONResponse({
             "period_days": days,
             "total_practiced": total_practiced,
             "total_correct": total_correct,
             "accuracy": round(accuracy * 100, 1),
             "by_category": by_category,
-            "tasks_count": len(tasks)
-        }
+            "tasks_count": summary["tasks_count"]
+        })
         
     except Exception as e:
         raise HTTPException(
@@ -2,10 +2,13 @@
 SpeakMate AI - User Routes
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timedelta, timezone
 from typing import List
+import asyncio
 
+from app.core.cache import cache
 from app.core.security import get_current_user
-from app.db.supabase import db_service
+from app.db.supabase import USER_STATS_CACHE_TTL, db_service, execute_query, user_stats_cache_key
 from app.models.schemas import UserProfile, UserProfileUpdate, ErrorProfile
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -70,32 +73,76 @@ async def get_user_error_profile(
     return error_profile
 
 
+STATS_SESSION_LIMIT = 100
+TOP_ERROR_LIMIT = 5
+
+
+async def _load_user_stats(user_id: str) -> dict:
+    """Session totals, average band and sessions in the last 7 days."""
+    # One round-trip aggregate (migration_performance.sql)
+    try:
+        result = await execute_query(
+            db_service.client.rpc(
+                "user_stats",
+                {"p_user_id": user_id, "p_session_limit": STATS_SESSION_LIMIT},
+            )
+        )
+        if isinstance(result.data, dict):
+            return result.data
+    except Exception:
+        pass
+
+    sessions = await db_service.get_user_sessions_slim(user_id, limit=STATS_SESSION_LIMIT)
+    week_ago = datetime.now(timezone.utc) - timedelta(days=7)
+    
+    total_seconds = 0
+    bands = []
+    sessions_this_week = 0
+    for s in sessions:
+        total_seconds += s.get("duration_seconds") or 0
+        band = (s.get("overall_scores") or {}).get("overall_band")
+        if band:
+            bands.append(band)
+        try:
+            created_at = datetime.fromisoformat(s.get("created_at") or "")
+        except ValueError:
+            continue
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        if created_at >= week_ago:
+            sessions_this_week += 1
+    
+    return {
+        "total_sessions": len(sessions),
+        "total_practice_minutes": total_seconds // 60,
+        "average_band": sum(bands) / len(bands) if bands else None,
+        "sessions_this_week": sessions_this_week,
+    }
+
+
 @router.get("/me/stats", response_model=dict)
 async def get_user_stats(
     current_user: dict = Depends(get_current_user)
 ):
     """Get user's learning statistics."""
-    sessions = await db_service.get_user_sessions(current_user["user_id"], limit=100)
-    error_profile = await db_service.get_user_error_profile(current_user["user_id"])
-    
-    total_sessions = len(sessions)
-    total_minutes = sum(s.get("duration_seconds", 0) for s in sessions) // 60
+    user_id = current_user["user_id"]
+    cache_key = user_stats_cache_key(user_id)
+    cached = await cache.get_json(cache_key)
+    if cached is not None:
+        return cached
     
-    # Calculate average scores if available
-    scores_list = [s.get("overall_scores") for s in sessions if s.get("overall_scores")]
-    avg_band = 0
-    if scores_list:
-        bands = [s.get("overall_band", 0) for s in scores_list if s.get("overall_band")]
-        avg_band = sum(bands) / len(bands) if bands else 0
-    
-    # Most common errors
-    top_errors = error_profile[:5] if error_profile else []
+    summary, top_errors = await asyncio.gather(
+        _load_user_stats(user_id),
+        db_service.get_user_error_profile(user_id, limit=TOP_ERROR_LIMIT),
+    )
     
-    return {
-        "total_sessions": total_sessions,
-        "total_practice_minutes": total_minutes,
-        "average_band": round(avg_band, 1),
-        "sessions_this_week": len([s for s in sessions[:7]]),  # Simplified
+    stats = {
+        "total_sessions": summary["total_sessions"],
+        "total_practice_minutes": summary["total_practice_minutes"],
+        "average_band": round(float(summary["average_band"] or 0), 1),
+        "sessions_this_week": summary["sessions_this_week"],
         "top_error_categories": top_errors,
         "improvement_trend": "improving"  # TODO: Calculate actual trend
     }
+    cache.set_json_later(cache_key, stats, USER_STATS_CACHE_TTL)
+    return stats
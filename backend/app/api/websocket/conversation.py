@@ -2,20 +2,53 @@
 SpeakMate AI - WebSocket Conversation Handler
 """
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
-from typing import Optional
+from starlette.websockets import WebSocketState
+from collections import Counter
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
 import json
 import asyncio
 import base64
-from datetime import datetime
+import logging
+import struct
+import time
+from datetime import datetime, timezone
 
+import orjson
+
+from app.core.cache import cache
 from app.core.config import settings
 from app.core.security import verify_supabase_token_string
 from app.db.supabase import db_service
-from app.services.speech import SpeechService
-from app.services.conversation import ConversationService
-from app.services.analyzer import ErrorAnalyzer
+from app.services.speech import PartialTranscript, SpeechService, speech_service
+from app.services.conversation import HISTORY_WINDOW, ConversationService, conversation_service
+from app.services.analyzer import ErrorAnalyzer, error_analyzer
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Conversations with no client message for this long are closed; bounds
+# session_data even when a disconnect is never observed.
+SESSION_IDLE_TIMEOUT_SECONDS = 1800
+IDLE_SWEEP_INTERVAL_SECONDS = 300
+
+# History and errors are mirrored to Redis so a conversation survives a
+# reconnect to another worker or a restart; memory stays the hot copy.
+SESSION_STATE_TTL = 3600
+
+
+def _history_key(session_id: str) -> str:
+    return f"conversation:{session_id}:history"
+
+
+def _errors_key(session_id: str) -> str:
+    return f"conversation:{session_id}:errors"
+
+# Binary audio frames: [msg_type u32][is_final u8][reserved 3] then raw audio
+AUDIO_FRAME_HEADER = struct.Struct("<IB3x")
+AUDIO_FRAME_TYPE = 1
+
+_background_tasks: set[asyncio.Task] = set()
 
 
 class ConnectionManager:
@@ -24,16 +57,54 @@ class ConnectionManager:
     def __init__(self):
         self.active_connections: dict[str, WebSocket] = {}
         self.session_data: dict[str, dict] = {}
+        self._sweeper: Optional[asyncio.Task] = None
     
     async def connect(self, websocket: WebSocket, session_id: str):
         await websocket.accept()
         self.active_connections[session_id] = websocket
+        now_ns = time.monotonic_ns()
         self.session_data[session_id] = {
             "conversation_history": [],
+            "user_transcript_parts": [],
             "errors": [],
             "turn_count": 0,
-            "start_time": datetime.utcnow()
+            "start_ns": now_ns,
+            "last_activity_ns": now_ns,
+            "pending_writes": []
         }
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_idle_sessions())
+    
+    def touch(self, session_id: str):
+        """Record client activity for idle eviction."""
+        data = self.session_data.get(session_id)
+        if data is not None:
+            data["last_activity_ns"] = time.monotonic_ns()
+    
+    async def cleanup_idle_sessions(self):
+        """Close sockets idle past the timeout and drop orphaned session data."""
+        cutoff_ns = time.monotonic_ns() - SESSION_IDLE_TIMEOUT_SECONDS * 1_000_000_000
+        idle = [
+            sid for sid, data in self.session_data.items()
+            if data.get("last_activity_ns", data.get("start_ns", 0)) < cutoff_ns
+        ]
+        for session_id in idle:
+            websocket = self.active_connections.get(session_id)
+            if websocket is None:
+                logger.warning(f"Evicting orphaned conversation data: {session_id}")
+                self.session_data.pop(session_id, None)
+                continue
+            logger.info(f"Closing idle conversation: {session_id}")
+            try:
+                # The receive loop sees the disconnect and ends the session
+                await websocket.close(code=1001, reason="Idle timeout")
+            except Exception:
+                self.disconnect(session_id)
+    
+    async def _sweep_idle_sessions(self):
+        while self.session_data:
+            await asyncio.sleep(IDLE_SWEEP_INTERVAL_SECONDS)
+            await self.cleanup_idle_sessions()
     
     def disconnect(self, session_id: str):
         if session_id in self.active_connections:
@@ -42,8 +113,13 @@ class ConnectionManager:
             del self.session_data[session_id]
     
     async def send_message(self, session_id: str, message: dict):
-        if session_id in self.active_connections:
-            await self.active_connections[session_id].send_json(message)
+        websocket = self.active_connections.get(session_id)
+        # Skip sockets we already closed (e.g. idle eviction)
+        if websocket is not None and websocket.application_state == WebSocketState.CONNECTED:
+            # Text frame: both clients JSON.parse string payloads
+            await websocket.send_text(
+                orjson.dumps(message, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+            )
     
     def get_session_data(self, session_id: str) -> dict:
         return self.session_data.get(session_id, {})
@@ -66,7 +142,8 @@ async def conversation_websocket(
     WebSocket endpoint for real-time conversation.
     
     Message types:
-    - audio_chunk: Base64 encoded audio data
+    - audio_chunk: Base64 encoded audio data (or a binary frame, see
+      AUDIO_FRAME_HEADER)
     - text_input: Direct text input (for testing)
     - end_session: End the conversation
     - get_status: Get current session status
@@ -95,10 +172,13 @@ async def conversation_websocket(
 
     await manager.connect(websocket, session_id)
     
-    # Initialize services
-    speech_service = SpeechService()
-    conversation_service = ConversationService()
-    error_analyzer = ErrorAnalyzer()
+    # Pick up a conversation interrupted by a reconnect or a restart
+    session_data = manager.get_session_data(session_id)
+    history, errors = await asyncio.gather(
+        cache.get_json_list(_history_key(session_id)),
+        cache.get_json_list(_errors_key(session_id)),
+    )
+    resumed = bool(history)
     
     # Send welcome message
     await manager.send_message(session_id, {
@@ -107,103 +187,59 @@ async def conversation_websocket(
             "session_id": session_id,
             "mode": session.get("mode"),
             "topic": session.get("topic"),
+            "resumed": resumed,
             "message": "Connected! Ready to start conversation."
         }
     })
     
-    # Generate initial AI greeting
-    topic = session.get("topic", "general conversation")
-    initial_response = await conversation_service.generate_greeting(topic)
-    
-    await manager.send_message(session_id, {
-        "type": "ai_message",
-        "data": {
-            "text": initial_response,
-            "role": "assistant"
-        }
-    })
+    if resumed:
+        session_data["conversation_history"] = history
+        session_data["user_transcript_parts"] = [
+            turn["content"] for turn in history if turn.get("role") == "user"
+        ]
+        session_data["errors"] = errors
+        session_data["turn_count"] = 1 + len(session_data["user_transcript_parts"])
+        _restore_start(session_data, session)
+    else:
+        # Generate initial AI greeting
+        topic = session.get("topic", "general conversation")
+        initial_response = await conversation_service.generate_greeting(topic)
+        
+        await manager.send_message(session_id, {
+            "type": "ai_message",
+            "data": {
+                "text": initial_response,
+                "role": "assistant"
+            }
+        })
+        
+        # Save initial turn
+        greeting_turn = {"role": "assistant", "content": initial_response}
+        session_data["conversation_history"].append(greeting_turn)
+        session_data["turn_count"] = 1
+        await cache.append_json(_history_key(session_id), [greeting_turn], SESSION_STATE_TTL)
     
-    # Save initial turn
-    session_data = manager.get_session_data(session_id)
-    session_data["conversation_history"].append({
-        "role": "assistant",
-        "content": initial_response
-    })
-    session_data["turn_count"] = 1
+    ctx = ConversationContext(session_id, session, speech_service, conversation_service, error_analyzer)
     
     try:
         while True:
             # Receive message from client
-            data = await websocket.receive_json()
-            message_type = data.get("type")
-            payload = data.get("data", {})
-            
-            if message_type == "audio_chunk":
-                # Process audio chunk
-                audio_data = payload.get("audio_data")
-                is_final = payload.get("is_final", False)
-                
-                if audio_data:
-                    # Decode base64 audio
-                    audio_bytes = base64.b64decode(audio_data)
-                    
-                    # Transcribe audio
-                    transcription = await speech_service.transcribe_audio(
-                        audio_bytes,
-                        is_final=is_final
-                    )
-                    
-                    if transcription and transcription.get("text"):
-                        # Send transcription to client
-                        await manager.send_message(session_id, {
-                            "type": "transcription",
-                            "data": {
-                                "text": transcription["text"],
-                                "is_final": transcription.get("is_final", False),
-                                "confidence": transcription.get("confidence", 0)
-                            }
-                        })
-                        
-                        # If final transcription, process it
-                        if transcription.get("is_final"):
-                            await process_user_message(
-                                session_id,
-                                transcription["text"],
-                                session,
-                                conversation_service,
-                                error_analyzer
-                            )
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            manager.touch(session_id)
             
-            elif message_type == "text_input":
-                # Direct text input (for testing without audio)
-                text = payload.get("text", "")
-                if text:
-                    await process_user_message(
-                        session_id,
-                        text,
-                        session,
-                        conversation_service,
-                        error_analyzer
-                    )
+            if message.get("bytes") is not None:
+                # Binary frame: raw audio behind a fixed header
+                frame = parse_audio_frame(message["bytes"])
+                if frame and frame[1]:
+                    await handle_audio_chunk(ctx, frame[1], frame[0])
+                continue
             
-            elif message_type == "end_session":
-                # End the conversation
-                await end_conversation(session_id, session, error_analyzer)
+            data = orjson.loads(message.get("text") or "{}")
+            handler = MESSAGE_HANDLERS.get(data.get("type"))
+            if handler and await handler(ctx, data.get("data") or {}):
                 break
-            
-            elif message_type == "get_status":
-                # Return current session status
-                session_data = manager.get_session_data(session_id)
-                await manager.send_message(session_id, {
-                    "type": "status",
-                    "data": {
-                        "turn_count": session_data.get("turn_count", 0),
-                        "error_count": len(session_data.get("errors", [])),
-                        "duration_seconds": (
-                            datetime.utcnow() - session_data.get("start_time", datetime.utcnow())
-                        ).seconds
-                    }
-                })
     
     except WebSocketDisconnect:
         # Handle unexpected disconnection
@@ -213,6 +249,141 @@ async def conversation_websocket(
         manager.disconnect(session_id)
 
 
+def _restore_start(session_data: dict, session: dict):
+    """Date start_ns back to the session row's created_at so the duration
+    written at the end covers the whole conversation, not just this connection."""
+    try:
+        created_at = datetime.fromisoformat(session["created_at"])
+    except (KeyError, TypeError, ValueError):
+        return
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    elapsed = datetime.now(timezone.utc) - created_at
+    if elapsed.total_seconds() > 0:
+        session_data["start_ns"] -= int(elapsed.total_seconds() * 1_000_000_000)
+
+
+def _elapsed_seconds(session_data: dict) -> int:
+    now_ns = time.monotonic_ns()
+    return (now_ns - session_data.get("start_ns", now_ns)) // 1_000_000_000
+
+
+@dataclass
+class ConversationContext:
+    """Per-connection state shared by the message handlers."""
+    session_id: str
+    session: dict
+    speech_service: SpeechService
+    conversation_service: ConversationService
+    error_analyzer: ErrorAnalyzer
+
+
+async def _on_audio_chunk(ctx: ConversationContext, payload: dict) -> bool:
+    audio_data = payload.get("audio_data")
+    if audio_data:
+        # Decode base64 audio
+        await handle_audio_chunk(ctx, base64.b64decode(audio_data), payload.get("is_final", False))
+    return False
+
+
+async def _on_text_input(ctx: ConversationContext, payload: dict) -> bool:
+    # Direct text input (for testing without audio)
+    text = payload.get("text", "")
+    if text:
+        await process_user_message(
+            ctx.session_id,
+            text,
+            ctx.session,
+            ctx.conversation_service,
+            ctx.error_analyzer
+        )
+    return False
+
+
+async def _on_end_session(ctx: ConversationContext, payload: dict) -> bool:
+    await end_conversation(ctx.session_id, ctx.session, ctx.error_analyzer)
+    return True
+
+
+async def _on_get_status(ctx: ConversationContext, payload: dict) -> bool:
+    session_data = manager.get_session_data(ctx.session_id)
+    await manager.send_message(ctx.session_id, {
+        "type": "status",
+        "data": {
+            "turn_count": session_data.get("turn_count", 0),
+            "error_count": len(session_data.get("errors", [])),
+            "duration_seconds": _elapsed_seconds(session_data)
+        }
+    })
+    return False
+
+
+# Client message type -> handler; a handler returns True to close the loop
+MESSAGE_HANDLERS: dict[str, Callable[[ConversationContext, dict], Awaitable[bool]]] = {
+    "audio_chunk": _on_audio_chunk,
+    "text_input": _on_text_input,
+    "end_session": _on_end_session,
+    "get_status": _on_get_status,
+}
+
+
+def parse_audio_frame(frame: bytes) -> Optional[tuple[bool, bytes]]:
+    """
+    Split a binary audio frame into (is_final, audio bytes).
+    
+    Header is 8 bytes, little-endian: msg_type u32, is_final u8, 3 reserved.
+    Returns None for frames that are not audio chunks.
+    """
+    if len(frame) < AUDIO_FRAME_HEADER.size:
+        return None
+    msg_type, is_final = AUDIO_FRAME_HEADER.unpack_from(frame)
+    if msg_type != AUDIO_FRAME_TYPE:
+        return None
+    return bool(is_final), frame[AUDIO_FRAME_HEADER.size:]
+
+
+async def handle_audio_chunk(ctx: ConversationContext, audio_bytes: bytes, is_final: bool):
+    """Transcribe an audio chunk and reply once the utterance is final."""
+    session_id = ctx.session_id
+    speech_service = ctx.speech_service
+    
+    # Partials transcribe a bounded per-utterance window; the final chunk
+    # carries the whole recording and is transcribed alone
+    partial = manager.get_session_data(session_id).setdefault(
+        "partial_transcript", PartialTranscript()
+    )
+    if is_final:
+        partial.reset()
+        transcription = await speech_service.transcribe_audio(
+            audio_bytes,
+            is_final=True
+        )
+    else:
+        transcription = await speech_service.transcribe_partial(partial, audio_bytes)
+    
+    if transcription and transcription.get("text"):
+        # Send transcription to client
+        await manager.send_message(session_id, {
+            "type": "transcription",
+            "data": {
+                "text": transcription["text"],
+                "confirmed_text": transcription.get("confirmed_text", transcription["text"]),
+                "is_final": transcription.get("is_final", False),
+                "confidence": transcription.get("confidence", 0)
+            }
+        })
+        
+        # If final transcription, process it
+        if transcription.get("is_final"):
+            await process_user_message(
+                session_id,
+                transcription["text"],
+                ctx.session,
+                ctx.conversation_service,
+                ctx.error_analyzer
+            )
+
+
 async def process_user_message(
     session_id: str,
     text: str,
@@ -225,36 +396,37 @@ async def process_user_message(
     session_data = manager.get_session_data(session_id)
     
     # Add user message to history
-    session_data["conversation_history"].append({
-        "role": "user",
-        "content": text
-    })
+    user_turn = {"role": "user", "content": text}
+    session_data["conversation_history"].append(user_turn)
+    session_data["user_transcript_parts"].append(text)
     
-    # Analyze for errors (in background)
-    errors = await error_analyzer.analyze_text(
-        text,
-        native_language=session.get("native_language", "uz"),
-        topic=session.get("topic", "general")
+    # Error analysis is only shown at the end, so run it alongside the reply
+    analyze_task = asyncio.create_task(
+        _analyze_turn(session_data, session_id, text, session, error_analyzer)
     )
     
-    if errors:
-        session_data["errors"].extend(errors)
-        # Don't send errors to client during conversation
-        # They will be shown at the end
-    
-    # Generate AI response
-    response = await conversation_service.generate_response(
-        user_message=text,
-        conversation_history=session_data["conversation_history"],
-        topic=session.get("topic", "general"),
-        user_level="B1"  # TODO: Get from user profile
-    )
+    # Stream the AI response; clients that ignore deltas still get the full ai_message
+    chunks = []
+    try:
+        async for chunk in conversation_service.stream_response(
+            user_message=text,
+            conversation_history=session_data["conversation_history"][-HISTORY_WINDOW:],
+            topic=session.get("topic", "general"),
+            user_level="B1"  # TODO: Get from user profile
+        ):
+            chunks.append(chunk)
+            await manager.send_message(session_id, {
+                "type": "ai_message_delta",
+                "data": {"text": chunk, "role": "assistant"}
+            })
+    except BaseException:
+        analyze_task.cancel()
+        raise
+    response = "".join(chunks).strip()
     
     # Add AI response to history
-    session_data["conversation_history"].append({
-        "role": "assistant",
-        "content": response
-    })
+    assistant_turn = {"role": "assistant", "content": response}
+    session_data["conversation_history"].append(assistant_turn)
     
     session_data["turn_count"] += 1
     
@@ -268,19 +440,58 @@ async def process_user_message(
         }
     })
     
-    # Save conversation turn to database
-    await db_service.save_conversation_turn(session_id, {
-        "role": "user",
-        "content": text,
-        "transcription": text,
-        "sequence_order": session_data["turn_count"] * 2 - 1
-    })
+    # Save both sides of the turn in one insert without holding up the next message
+    _save_turns_later(session_data, session_id, [
+        {
+            "role": "user",
+            "content": text,
+            "transcription": text,
+            "sequence_order": session_data["turn_count"] * 2 - 1
+        },
+        {
+            "role": "assistant",
+            "content": response,
+            "sequence_order": session_data["turn_count"] * 2
+        },
+    ])
+    _track_pending(session_data, asyncio.create_task(
+        cache.append_json(_history_key(session_id), [user_turn, assistant_turn], SESSION_STATE_TTL)
+    ))
     
-    await db_service.save_conversation_turn(session_id, {
-        "role": "assistant",
-        "content": response,
-        "sequence_order": session_data["turn_count"] * 2
-    })
+    # Analysis finishes in the background; end_conversation waits for it
+    _track_pending(session_data, analyze_task)
+
+
+async def _analyze_turn(
+    session_data: dict,
+    session_id: str,
+    text: str,
+    session: dict,
+    error_analyzer: ErrorAnalyzer
+):
+    errors = await error_analyzer.analyze_text(
+        text,
+        native_language=session.get("native_language", "uz"),
+        topic=session.get("topic", "general")
+    )
+    if errors:
+        session_data["errors"].extend(errors)
+        # Don't send errors to client during conversation
+        # They will be shown at the end
+        await cache.append_json(_errors_key(session_id), errors, SESSION_STATE_TTL)
+
+
+def _save_turns_later(session_data: dict, session_id: str, turns: list[dict]):
+    _track_pending(session_data, asyncio.create_task(db_service.save_conversation_turns(session_id, turns)))
+
+
+def _track_pending(session_data: dict, task: asyncio.Task):
+    # Keep a strong reference until done; the event loop only holds weak ones.
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    pending = [t for t in session_data.get("pending_writes", []) if not t.done()]
+    pending.append(task)
+    session_data["pending_writes"] = pending
 
 
 async def end_conversation(
@@ -292,28 +503,32 @@ async def end_conversation(
     
     session_data = manager.get_session_data(session_id)
     
+    # Turn writes and error analysis must finish before the session is closed out
+    pending_writes = session_data.get("pending_writes") or []
+    if pending_writes:
+        await asyncio.gather(*pending_writes, return_exceptions=True)
+    
     # Calculate duration
-    start_time = session_data.get("start_time", datetime.utcnow())
-    duration_seconds = (datetime.utcnow() - start_time).seconds
+    duration_seconds = _elapsed_seconds(session_data)
     
     # Save all errors to database
     if session_data.get("errors"):
-        await db_service.save_detected_errors(session_id, session_data["errors"])
-        
-        # Update user's error profile
-        user_id = session.get("user_id")
-        for error in session_data["errors"]:
-            await db_service.update_error_profile(
-                user_id,
+        # Update user's error profile in one batch alongside the error rows
+        profile_counts = Counter(
+            (
                 error.get("category"),
-                error.get("subcategory", "general")
+                error.get("subcategory", "general"),
+                error.get("error_code") or "GRAM_OTHER",
             )
+            for error in session_data["errors"]
+        )
+        await asyncio.gather(
+            db_service.save_detected_errors(session_id, session_data["errors"]),
+            db_service.bulk_update_error_profile(session.get("user_id"), profile_counts),
+        )
     
     # Generate overall scores
-    full_transcription = " ".join([
-        turn["content"] for turn in session_data.get("conversation_history", [])
-        if turn.get("role") == "user"
-    ])
+    full_transcription = " ".join(session_data.get("user_transcript_parts", []))
     
     scores = await error_analyzer.generate_scores(
         full_transcription,
@@ -326,6 +541,7 @@ async def end_conversation(
         "overall_scores": scores,
         "ended_at": datetime.utcnow().isoformat()
     })
+    await cache.delete(_history_key(session_id), _errors_key(session_id))
     
     # Send final analysis to client
     await manager.send_message(session_id, {
@@ -4,11 +4,12 @@ SpeakMate AI - WebSocket Protocol Specification (Production)
 This module defines the exact message format and protocol for real-time
 audio streaming between client and server.
 """
+from dataclasses import dataclass
 from enum import Enum
 from typing import Optional, List, Dict, Any, Union
 from pydantic import BaseModel, Field, validator
 from datetime import datetime
-import json
+import time
 
 
 # =============================================================================
@@ -100,7 +101,7 @@ class ClientMessage(BaseModel):
     
     @classmethod
     def session_start(cls, seq: int, payload: SessionStartPayload) -> "ClientMessage":
-        return cls(type=ClientMessageType.SESSION_START, seq=seq, payload=payload.dict())
+        return cls(type=ClientMessageType.SESSION_START, seq=seq, payload=payload.model_dump())
     
     @classmethod
     def session_resume(cls, seq: int, session_id: str, last_seq: int) -> "ClientMessage":
@@ -112,7 +113,7 @@ class ClientMessage(BaseModel):
     
     @classmethod
     def audio_config(cls, seq: int, config: AudioConfig) -> "ClientMessage":
-        return cls(type=ClientMessageType.AUDIO_CONFIG, seq=seq, payload=config.dict())
+        return cls(type=ClientMessageType.AUDIO_CONFIG, seq=seq, payload=config.model_dump())
     
     @classmethod
     def audio_commit(cls, seq: int) -> "ClientMessage":
@@ -222,7 +223,7 @@ class ServerMessage(BaseModel):
     payload: Optional[Dict[str, Any]] = None
     
     def to_json(self) -> str:
-        return self.json()
+        return self.model_dump_json()
     
     @classmethod
     def session_started(cls, seq: int, session_id: str, mode: str) -> "ServerMessage":
@@ -237,12 +238,12 @@ class ServerMessage(BaseModel):
         return cls(
             type=ServerMessageType.STT_PARTIAL,
             seq=seq,
-            payload={"text": text, "stability": stability, "timestamp_ms": int(datetime.utcnow().timestamp() * 1000)}
+            payload={"text": text, "stability": stability, "timestamp_ms": _now_ms()}
         )
     
     @classmethod
     def stt_final(cls, seq: int, payload: STTFinalPayload) -> "ServerMessage":
-        return cls(type=ServerMessageType.STT_FINAL, seq=seq, payload=payload.dict())
+        return cls(type=ServerMessageType.STT_FINAL, seq=seq, payload=payload.model_dump())
     
     @classmethod
     def ai_reply(cls, seq: int, text: str, turn_id: str) -> "ServerMessage":
@@ -278,8 +279,13 @@ class SessionState(str, Enum):
     ERROR = "error"
 
 
-class SessionContext(BaseModel):
-    """Full session context for state recovery."""
+@dataclass(slots=True, kw_only=True)
+class SessionContext:
+    """Full session context for state recovery.
+
+    Plain in-memory struct mutated in place on every frame, so it is a
+    slotted dataclass rather than a validated pydantic model.
+    """
     session_id: str
     user_id: str
     state: SessionState
@@ -360,19 +366,27 @@ class ErrorCode(str, Enum):
 # PROTOCOL HELPERS
 # =============================================================================
 
-def parse_client_message(data: str) -> ClientMessage:
-    """Parse JSON string to ClientMessage."""
+def _now_ms() -> int:
+    """Wall-clock epoch milliseconds without building a datetime."""
+    return time.time_ns() // 1_000_000
+
+
+def parse_client_message(data: Union[str, bytes]) -> ClientMessage:
+    """Parse a JSON text or binary frame to ClientMessage in one validation pass."""
     try:
-        parsed = json.loads(data)
-        return ClientMessage(**parsed)
+        return ClientMessage.model_validate_json(data)
     except Exception as e:
         raise ValueError(f"Invalid message format: {e}")
 
 
+# First-byte prefixes that are not binary audio: JSON objects and empty frames
+_NON_AUDIO_PREFIXES = frozenset({b"{", b""})
+
+
 def is_binary_message(data: bytes) -> bool:
     """Check if message is binary audio data."""
     # Binary audio doesn't start with '{' (JSON)
-    return len(data) > 0 and data[0] != ord('{')
+    return data[:1] not in _NON_AUDIO_PREFIXES
 
 
 class ProtocolVersion:
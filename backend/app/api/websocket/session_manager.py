@@ -3,7 +3,12 @@ SpeakMate AI - Session Manager (Production)
 
 Handles session lifecycle, state recovery, and deterministic state management.
 """
-from typing import Dict, Optional, List
+from bisect import bisect_right
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from operator import itemgetter
+from typing import Deque, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 from fastapi import WebSocket
 import asyncio
@@ -21,6 +26,17 @@ from app.core.config import settings
 logger = logging.getLogger(__name__)
 
 
+@dataclass(slots=True)
+class _SessionSlot:
+    """Everything held for one session, so each operation does a single lookup."""
+    context: SessionContext
+    websocket: Optional[WebSocket]
+    # (seq, serialized message) pairs so replays reuse the encoded frame
+    buffer: Deque[Tuple[int, str]]
+    # Set while disconnected: when the reconnection window closes
+    reconnect_deadline: Optional[datetime] = None
+
+
 class SessionManager:
     """
     Manages active WebSocket sessions with deterministic state.
@@ -33,17 +49,8 @@ class SessionManager:
     """
     
     def __init__(self):
-        # Active sessions: session_id -> SessionContext
-        self.sessions: Dict[str, SessionContext] = {}
-        
-        # WebSocket connections: session_id -> WebSocket
-        self.connections: Dict[str, WebSocket] = {}
-        
-        # Pending reconnections: session_id -> expiry_time
-        self.pending_reconnect: Dict[str, datetime] = {}
-        
-        # Message buffers for replay: session_id -> List[ServerMessage]
-        self.message_buffers: Dict[str, List[ServerMessage]] = {}
+        # session_id -> context, connection, replay buffer and reconnect deadline
+        self._slots: Dict[str, _SessionSlot] = {}
         
         # Max buffer size for replay
         self.max_buffer_size = 100
@@ -84,9 +91,11 @@ class SessionManager:
         )
         
         # Store session
-        self.sessions[session_id] = context
-        self.connections[session_id] = websocket
-        self.message_buffers[session_id] = []
+        self._slots[session_id] = _SessionSlot(
+            context=context,
+            websocket=websocket,
+            buffer=deque(maxlen=self.max_buffer_size),
+        )
         
         logger.info(f"Session created: {session_id} for user {user_id}")
         
@@ -100,8 +109,10 @@ class SessionManager:
     ) -> Optional[SessionContext]:
         """Resume a disconnected session."""
         
+        slot = self._slots.get(session_id)
+        
         # Check if session exists and is resumable
-        if session_id not in self.sessions:
+        if slot is None:
             # Try to recover from database
             db_session = await db_service.get_session(session_id)
             if not db_session:
@@ -111,25 +122,23 @@ class SessionManager:
             logger.warning(f"Session {session_id} recovered from DB (limited state)")
             return None
         
-        context = self.sessions[session_id]
-        
         # Check reconnection window
-        if session_id in self.pending_reconnect:
-            if datetime.utcnow() > self.pending_reconnect[session_id]:
+        if slot.reconnect_deadline is not None:
+            if datetime.utcnow() > slot.reconnect_deadline:
                 logger.info(f"Session {session_id} reconnection window expired")
                 return None
-            del self.pending_reconnect[session_id]
+            slot.reconnect_deadline = None
         
         # Update connection
-        self.connections[session_id] = websocket
-        context.last_activity_at = datetime.utcnow()
+        slot.websocket = websocket
+        slot.context.last_activity_at = datetime.utcnow()
         
         # Replay missed messages
         await self._replay_messages(websocket, session_id, last_seq)
         
         logger.info(f"Session resumed: {session_id}")
         
-        return context
+        return slot.context
     
     async def _replay_messages(
         self,
@@ -139,15 +148,20 @@ class SessionManager:
     ):
         """Replay messages missed during disconnect."""
         
-        if session_id not in self.message_buffers:
+        slot = self._slots.get(session_id)
+        if slot is None:
             return
         
-        buffer = self.message_buffers[session_id]
-        missed = [msg for msg in buffer if msg.seq > last_seq]
+        buffer = slot.buffer
+        # seq increases monotonically, so the buffer is sorted by it
+        start = bisect_right(buffer, last_seq, key=itemgetter(0))
+        if start == len(buffer):
+            return
+        missed = [frame for _, frame in islice(buffer, start, None)]
         
-        for msg in missed:
+        for frame in missed:
             try:
-                await websocket.send_text(msg.to_json())
+                await websocket.send_text(frame)
             except Exception as e:
                 logger.error(f"Failed to replay message: {e}")
                 break
@@ -157,32 +171,29 @@ class SessionManager:
     async def handle_disconnect(self, session_id: str):
         """Handle WebSocket disconnection."""
         
-        if session_id not in self.sessions:
+        slot = self._slots.get(session_id)
+        if slot is None:
             return
         
-        context = self.sessions[session_id]
-        
         # Set reconnection window
-        self.pending_reconnect[session_id] = (
-            datetime.utcnow() + timedelta(seconds=self.reconnect_window)
-        )
+        slot.reconnect_deadline = datetime.utcnow() + timedelta(seconds=self.reconnect_window)
         
         # Update state
-        context.state = SessionState.PAUSED
+        slot.context.state = SessionState.PAUSED
         
         # Remove connection but keep session
-        if session_id in self.connections:
-            del self.connections[session_id]
+        slot.websocket = None
         
         logger.info(f"Session {session_id} disconnected, waiting for reconnect")
     
     async def end_session(self, session_id: str) -> Optional[Dict]:
         """End a session and trigger analysis."""
         
-        if session_id not in self.sessions:
+        slot = self._slots.get(session_id)
+        if slot is None:
             return None
         
-        context = self.sessions[session_id]
+        context = slot.context
         context.state = SessionState.ANALYZING
         
         # Calculate final duration
@@ -195,10 +206,8 @@ class SessionManager:
         })
         
         # Cleanup
-        if session_id in self.connections:
-            del self.connections[session_id]
-        if session_id in self.pending_reconnect:
-            del self.pending_reconnect[session_id]
+        slot.websocket = None
+        slot.reconnect_deadline = None
         
         # Keep session context for analysis
         context.state = SessionState.COMPLETED
@@ -214,19 +223,19 @@ class SessionManager:
     ) -> bool:
         """Send message to client with buffering."""
         
-        # Buffer message for replay
-        if session_id in self.message_buffers:
-            buffer = self.message_buffers[session_id]
-            buffer.append(message)
-            
-            # Trim buffer if too large
-            if len(buffer) > self.max_buffer_size:
-                self.message_buffers[session_id] = buffer[-self.max_buffer_size:]
+        slot = self._slots.get(session_id)
+        if slot is None:
+            return False
+        
+        frame = message.to_json()
+        
+        # Buffer message for replay (deque drops the oldest past max_buffer_size)
+        slot.buffer.append((message.seq, frame))
         
         # Send if connected
-        if session_id in self.connections:
+        if slot.websocket is not None:
             try:
-                await self.connections[session_id].send_text(message.to_json())
+                await slot.websocket.send_text(frame)
                 return True
             except Exception as e:
                 logger.error(f"Failed to send message to {session_id}: {e}")
@@ -242,9 +251,10 @@ class SessionManager:
     ) -> bool:
         """Send binary data (TTS audio) to client."""
         
-        if session_id in self.connections:
+        slot = self._slots.get(session_id)
+        if slot is not None and slot.websocket is not None:
             try:
-                await self.connections[session_id].send_bytes(data)
+                await slot.websocket.send_bytes(data)
                 return True
             except Exception as e:
                 logger.error(f"Failed to send binary to {session_id}: {e}")
@@ -254,58 +264,59 @@ class SessionManager:
     
     def get_session(self, session_id: str) -> Optional[SessionContext]:
         """Get session context."""
-        return self.sessions.get(session_id)
+        slot = self._slots.get(session_id)
+        return slot.context if slot is not None else None
     
     def update_state(self, session_id: str, state: SessionState):
         """Update session state."""
-        if session_id in self.sessions:
-            self.sessions[session_id].state = state
-            self.sessions[session_id].last_activity_at = datetime.utcnow()
+        slot = self._slots.get(session_id)
+        if slot is not None:
+            slot.context.state = state
+            slot.context.last_activity_at = datetime.utcnow()
     
     def record_audio_chunk(self, session_id: str, duration_ms: int):
         """Record audio chunk statistics."""
-        if session_id in self.sessions:
-            context = self.sessions[session_id]
+        slot = self._slots.get(session_id)
+        if slot is not None:
+            context = slot.context
             context.audio_chunks_received += 1
             context.total_audio_ms += duration_ms
             context.last_activity_at = datetime.utcnow()
     
     def increment_turn(self, session_id: str):
         """Increment conversation turn count."""
-        if session_id in self.sessions:
-            self.sessions[session_id].turn_count += 1
+        slot = self._slots.get(session_id)
+        if slot is not None:
+            slot.context.turn_count += 1
     
     async def cleanup_expired_sessions(self):
         """Background task to cleanup expired sessions."""
         now = datetime.utcnow()
         
         expired = [
-            sid for sid, expiry in self.pending_reconnect.items()
-            if now > expiry
+            sid for sid, slot in self._slots.items()
+            if slot.reconnect_deadline is not None and now > slot.reconnect_deadline
         ]
         
         for session_id in expired:
             logger.info(f"Cleaning up expired session: {session_id}")
             
-            # End session in database
-            if session_id in self.sessions:
-                await self.end_session(session_id)
-            
-            # Cleanup
-            self.sessions.pop(session_id, None)
-            self.message_buffers.pop(session_id, None)
-            self.pending_reconnect.pop(session_id, None)
+            # End session in database, then drop everything held for it
+            await self.end_session(session_id)
+            self._slots.pop(session_id, None)
     
     def get_active_session_count(self) -> int:
         """Get count of active sessions."""
-        return len(self.connections)
+        return sum(1 for slot in self._slots.values() if slot.websocket is not None)
     
     def get_session_stats(self) -> Dict:
         """Get session statistics."""
         return {
-            "active_connections": len(self.connections),
-            "total_sessions": len(self.sessions),
-            "pending_reconnect": len(self.pending_reconnect)
+            "active_connections": self.get_active_session_count(),
+            "total_sessions": len(self._slots),
+            "pending_reconnect": sum(
+                1 for slot in self._slots.values() if slot.reconnect_deadline is not None
+            )
         }
 
 
@@ -0,0 +1,120 @@
+"""
+SpeakMate AI - Cache Layer
+
+Redis-backed read-through cache for hot lookups. Every operation degrades
+to a miss/no-op when Redis is disabled or unreachable, so callers can
+always fall back to the database.
+"""
+from typing import Any, Optional, Set
+import asyncio
+import logging
+
+import orjson
+from redis import asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CacheService:
+    """Async Redis cache storing JSON values."""
+
+    def __init__(self):
+        self._redis: Optional[aioredis.Redis] = None
+        self._pending: Set[asyncio.Task] = set()
+
+    @property
+    def client(self) -> Optional[aioredis.Redis]:
+        """Lazy access to the Redis client (None when caching is disabled)."""
+        if not settings.REDIS_ENABLED:
+            return None
+        if self._redis is None:
+            self._redis = aioredis.from_url(
+                settings.REDIS_URL,
+                socket_connect_timeout=1,
+                socket_timeout=1,
+            )
+        return self._redis
+
+    async def get_json(self, key: str) -> Optional[Any]:
+        """Get a cached JSON value, or None on miss/failure."""
+        client = self.client
+        if client is None:
+            return None
+        try:
+            raw = await client.get(key)
+        except Exception as e:
+            logger.warning(f"Cache get failed for {key}: {e}")
+            return None
+        if raw is None:
+            return None
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            return None
+
+    async def set_json(self, key: str, value: Any, ttl: int) -> None:
+        """Store a JSON-serializable value with a TTL in seconds."""
+        client = self.client
+        if client is None:
+            return
+        try:
+            payload = orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+            await client.setex(key, ttl, payload)
+        except Exception as e:
+            logger.warning(f"Cache set failed for {key}: {e}")
+
+    async def append_json(self, key: str, values: list, ttl: int) -> None:
+        """Append JSON values to a list and refresh its TTL in seconds."""
+        client = self.client
+        if client is None or not values:
+            return
+        try:
+            payloads = [orjson.dumps(v, default=str, option=orjson.OPT_NON_STR_KEYS) for v in values]
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.rpush(key, *payloads)
+                pipe.expire(key, ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Cache append failed for {key}: {e}")
+
+    async def get_json_list(self, key: str) -> list:
+        """Get all values of a JSON list, or [] on miss/failure."""
+        client = self.client
+        if client is None:
+            return []
+        try:
+            raw_values = await client.lrange(key, 0, -1)
+            return [orjson.loads(raw) for raw in raw_values]
+        except Exception as e:
+            logger.warning(f"Cache list get failed for {key}: {e}")
+            return []
+
+    def set_json_later(self, key: str, value: Any, ttl: int) -> None:
+        """Populate the cache in the background so a miss does not wait on Redis."""
+        if self.client is None:
+            return
+        task = asyncio.create_task(self.set_json(key, value, ttl))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def delete(self, *keys: str) -> None:
+        """Invalidate one or more keys."""
+        client = self.client
+        if client is None or not keys:
+            return
+        try:
+            await client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Cache delete failed for {keys}: {e}")
+
+    async def close(self) -> None:
+        """Close the Redis connection pool."""
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+# Global instance
+cache = CacheService()
@@ -41,6 +41,12 @@ class Settings(BaseSettings):
     SUPABASE_KEY: str = ""
     SUPABASE_SERVICE_ROLE_KEY: Optional[str] = None
     SUPABASE_JWT_SECRET: Optional[str] = None  # From Supabase Dashboard -> Settings -> API
+    # Shared HTTP pool for PostgREST/storage calls (queries run in worker threads).
+    # The pool is per uvicorn worker: total upstream connections are roughly
+    # WEB_CONCURRENCY * SUPABASE_MAX_CONNECTIONS, so lower this when adding workers.
+    SUPABASE_MAX_CONNECTIONS: int = 32
+    SUPABASE_MAX_KEEPALIVE_CONNECTIONS: int = 16
+    SUPABASE_KEEPALIVE_EXPIRY: float = 30.0
     
     # Google Cloud settings
     GOOGLE_CLOUD_PROJECT: str = ""
@@ -61,6 +67,7 @@ class Settings(BaseSettings):
     # Storage settings
     STORAGE_BUCKET: str = "speakmate-assets"
     PDF_RETENTION_DAYS: int = 30
+    PDF_MAX_CONCURRENCY: int = 2  # Reports rendered at once per worker; others wait
     AUDIO_RETENTION_DAYS: int = 7
     
     # Rate limiting
@@ -0,0 +1,51 @@
+"""
+SpeakMate AI - HTTP Caching Helpers
+
+ETag support for session reads. Only finished sessions get an ETag: once
+a session has ended its turns and errors no longer change, so a client
+holding a matching ETag can be answered with 304 without re-reading them.
+"""
+from typing import Optional
+import hashlib
+
+import orjson
+from fastapi import Response, status
+
+SESSION_CACHE_CONTROL = "private, max-age=300"
+
+
+def session_etag(session: dict) -> Optional[str]:
+    """Weak ETag for a finished session, or None while it is still active."""
+    if not session.get("ended_at"):
+        return None
+    state = orjson.dumps(
+        [
+            str(session.get("id")),
+            session.get("ended_at"),
+            session.get("duration_seconds"),
+            session.get("overall_scores"),
+        ],
+        default=str,
+        option=orjson.OPT_SORT_KEYS,
+    )
+    return f'W/"{hashlib.blake2b(state, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """Whether an If-None-Match header value matches the current ETag."""
+    if not if_none_match or not etag:
+        return False
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    if "*" in candidates:
+        return True
+    # Weak comparison: W/"x" and "x" are equivalent for GET revalidation.
+    opaque = etag.removeprefix("W/")
+    return any(tag.removeprefix("W/") == opaque for tag in candidates)
+
+
+def cache_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": SESSION_CACHE_CONTROL}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
@@ -12,6 +12,7 @@ import logging
 from urllib.parse import parse_qs, unquote
 from typing import Optional
 
+from cachetools import TTLCache
 from fastapi import HTTPException, status
 from jose import jwt as jose_jwt
 
@@ -22,6 +23,11 @@ logger = logging.getLogger(__name__)
 # How long initData is considered valid (seconds)
 INIT_DATA_EXPIRY = 3600  # 1 hour
 
+# Mini App reloads re-send identical initData; remember recent successful
+# validations (keyed by digest) so repeat calls skip HMAC and JSON parsing.
+VALIDATION_CACHE_TTL = 60
+_validated_init_data: TTLCache = TTLCache(maxsize=10_000, ttl=VALIDATION_CACHE_TTL)
+
 
 def validate_telegram_init_data(init_data: str) -> dict:
     """
@@ -43,6 +49,13 @@ def validate_telegram_init_data(init_data: str) -> dict:
             detail="TELEGRAM_BOT_TOKEN not configured",
         )
 
+    cache_key = hashlib.blake2b(init_data.encode("utf-8"), digest_size=16).digest()
+    cached = _validated_init_data.get(cache_key)
+    if cached is not None:
+        user, expires_at = cached
+        if time.time() <= expires_at:
+            return dict(user)
+
     try:
         # Parse the query-string style data
         parsed = parse_qs(init_data, keep_blank_values=True)
@@ -73,10 +86,12 @@ def validate_telegram_init_data(init_data: str) -> dict:
 
         # Optionally check auth_date freshness
         auth_date_str = parsed.get("auth_date", [None])[0]
+        expires_at = float("inf")
         if auth_date_str:
             auth_date = int(auth_date_str)
             if time.time() - auth_date > INIT_DATA_EXPIRY:
                 raise ValueError("initData expired")
+            expires_at = auth_date + INIT_DATA_EXPIRY
 
         # Parse user JSON
         user_str = parsed.get("user", [None])[0]
@@ -84,7 +99,8 @@ def validate_telegram_init_data(init_data: str) -> dict:
             raise ValueError("No user in initData")
 
         user = json.loads(unquote(user_str))
-        return user
+        _validated_init_data[cache_key] = (user, expires_at)
+        return dict(user)
 
     except ValueError as e:
         logger.warning(f"Telegram initData validation failed: {e}")
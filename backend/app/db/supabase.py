@@ -1,23 +1,90 @@
 """
 SpeakMate AI - Supabase Database Client
 """
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
+from collections import defaultdict
 from typing import Optional
 from uuid import UUID
 from uuid import uuid4
-from datetime import datetime
+from datetime import datetime, timezone
+import asyncio
 import logging
 
+import httpx
+from cachetools import TTLCache
+
+from app.core.cache import cache
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 _supabase_client: Client | None = None
+_http_client: httpx.Client | None = None
+
+# Profile reads happen on nearly every authenticated request. The cache is
+# shared through Redis so a write in one worker is seen by all of them.
+PROFILE_CACHE_TTL = 30
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _profile_cache_key(user_id: str) -> str:
+    return f"profile:{user_id}"
+
+
+# Weekly summary responses only change when a session is created or updated.
+WEEKLY_SUMMARY_CACHE_TTL = 3600
+
+
+def weekly_summary_cache_key(user_id: str) -> str:
+    today = _utcnow().date().isoformat()
+    return f"weekly:{user_id}:{today}"
+
+
+# Dashboard stats are recomputed from recent sessions and the error profile.
+USER_STATS_CACHE_TTL = 120
+
+
+def user_stats_cache_key(user_id: str) -> str:
+    return f"user:stats:{user_id}"
+
+
+def _session_summary_cache_keys(user_id: str) -> tuple:
+    """Cached aggregates derived from a user's sessions."""
+    return weekly_summary_cache_key(user_id), user_stats_cache_key(user_id)
+
+
+# Session columns needed for dashboards and coaching summaries (both schemas).
+SESSION_SUMMARY_COLUMNS = "id,mode,topic,duration_seconds,overall_scores,created_at,ended_at"
+
+# Rows requested per page for bulk reads; matches PostgREST's default max-rows.
+BULK_PAGE_SIZE = 1000
+
+# A session's owner never changes, so ownership checks can be answered from a
+# per-process cache; the TTL only bounds how long deleted sessions linger.
+SESSION_OWNER_CACHE_TTL = 60
+_session_owner_cache: TTLCache = TTLCache(maxsize=50_000, ttl=SESSION_OWNER_CACHE_TTL)
+
+
+def _build_http_client() -> httpx.Client:
+    """Shared HTTP client so PostgREST/storage calls reuse keep-alive connections."""
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.SUPABASE_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(120.0, connect=10.0),
+        follow_redirects=True,
+        http2=True,
+    )
 
 
 def get_supabase_client() -> Client:
     """Get or create Supabase client instance (lazy singleton)."""
-    global _supabase_client
+    global _supabase_client, _http_client
     if _supabase_client is None:
         if not settings.SUPABASE_URL or (not settings.SUPABASE_SERVICE_ROLE_KEY and not settings.SUPABASE_KEY):
             raise RuntimeError("SUPABASE_URL and at least one Supabase key must be set")
@@ -26,16 +93,43 @@ def get_supabase_client() -> Client:
             logger.info("Using SUPABASE_SERVICE_ROLE_KEY for server-side database operations")
         else:
             logger.warning("SUPABASE_SERVICE_ROLE_KEY not set; falling back to SUPABASE_KEY")
-        _supabase_client = create_client(settings.SUPABASE_URL, key)
+        _http_client = _build_http_client()
+        _supabase_client = create_client(
+            settings.SUPABASE_URL,
+            key,
+            options=ClientOptions(httpx_client=_http_client),
+        )
         logger.info("Supabase client initialized")
     return _supabase_client
 
 
+def close_supabase_client() -> None:
+    """Close the shared HTTP pool (application shutdown)."""
+    global _supabase_client, _http_client
+    if _http_client is not None:
+        _http_client.close()
+    _http_client = None
+    _supabase_client = None
+    db_service._client = None
+
+
+async def execute_query(query):
+    """
+    Execute a Supabase query builder in a worker thread.
+
+    supabase-py is synchronous; running .execute() off the event loop keeps
+    other requests and websockets responsive while PostgREST answers.
+    """
+    return await asyncio.to_thread(query.execute)
+
+
 class DatabaseService:
     """Database operations service."""
     
     def __init__(self, client: Client = None):
         self._client = client
+        self._errors_table: Optional[str] = None
+        self._run_type_column: Optional[str] = None
 
     @property
     def client(self) -> Client:
@@ -44,34 +138,85 @@ class DatabaseService:
             self._client = get_supabase_client()
         return self._client
     
+    async def get_errors_table(self) -> str:
+        """Error table for this deployment: error_instances (production) or detected_errors (legacy).
+
+        Probed once per process; not cached when neither table answers so a
+        transient failure does not pin the wrong schema.
+        """
+        if self._errors_table is not None:
+            return self._errors_table
+        for table in ("error_instances", "detected_errors"):
+            try:
+                await execute_query(self.client.table(table).select("id").limit(1))
+            except Exception:
+                continue
+            self._errors_table = table
+            return table
+        return "error_instances"
+
+    async def get_run_type_column(self) -> str:
+        """analysis_runs type column: run_type (production) or analysis_type (legacy).
+
+        Probed once per process, like get_errors_table.
+        """
+        if self._run_type_column is not None:
+            return self._run_type_column
+        for column in ("run_type", "analysis_type"):
+            try:
+                await execute_query(self.client.table("analysis_runs").select(column).limit(1))
+            except Exception:
+                continue
+            self._run_type_column = column
+            return column
+        return "run_type"
+
     # User operations
     async def get_user_profile(self, user_id: str) -> Optional[dict]:
-        """Get user profile by ID."""
-        response = self.client.table("users").select("*").eq("id", user_id).single().execute()
-        return response.data if response.data else None
+        """Get user profile by ID (read-through Redis cache)."""
+        key = _profile_cache_key(user_id)
+        cached = await cache.get_json(key)
+        if cached is not None:
+            return cached
+        response = await execute_query(self.client.table("users").select("*").eq("id", user_id).single())
+        profile = response.data if response.data else None
+        if profile:
+            cache.set_json_later(key, profile, PROFILE_CACHE_TTL)
+        return profile
     
     async def update_user_profile(self, user_id: str, data: dict) -> dict:
         """Update user profile."""
-        response = self.client.table("users").update(data).eq("id", user_id).execute()
-        return response.data[0] if response.data else None
+        response = await execute_query(self.client.table("users").update(data).eq("id", user_id))
+        profile = response.data[0] if response.data else None
+        await self._refresh_cached_profile(user_id, profile)
+        return profile
     
     async def create_user_profile(self, user_id: str, data: dict) -> dict:
         """Create new user profile."""
         data["id"] = user_id
-        response = self.client.table("users").insert(data).execute()
-        return response.data[0] if response.data else None
+        response = await execute_query(self.client.table("users").insert(data))
+        profile = response.data[0] if response.data else None
+        await self._refresh_cached_profile(user_id, profile)
+        return profile
+
+    async def _refresh_cached_profile(self, user_id: str, profile: Optional[dict]) -> None:
+        """Write the fresh row through to the profile cache, or drop the entry."""
+        key = _profile_cache_key(user_id)
+        if profile:
+            await cache.set_json(key, profile, PROFILE_CACHE_TTL)
+        else:
+            await cache.delete(key)
 
     # Super coach operations
     async def get_coach_daily_mission(self, user_id: str, mission_date: str) -> Optional[dict]:
         """Get stored daily mission by date."""
         try:
-            response = (
+            response = await execute_query(
                 self.client.table("coach_daily_missions")
                 .select("*")
                 .eq("user_id", user_id)
                 .eq("mission_date", mission_date)
                 .limit(1)
-                .execute()
             )
             rows = response.data or []
             return rows[0] if rows else None
@@ -94,12 +239,11 @@ class DatabaseService:
                 "mission_payload": mission_payload,
                 "difficulty": difficulty,
                 "best_hour": best_hour,
-                "updated_at": datetime.utcnow().isoformat(),
+                "updated_at": _utcnow().isoformat(),
             }
-            response = (
+            response = await execute_query(
                 self.client.table("coach_daily_missions")
                 .upsert(payload, on_conflict="user_id,mission_date")
-                .execute()
             )
             return response.data[0] if response.data else None
         except Exception:
@@ -117,8 +261,9 @@ class DatabaseService:
     ) -> Optional[dict]:
         """Mark mission as completed and store performance."""
         success_rate = tasks_completed / max(total_tasks, 1)
+        now_iso = _utcnow().isoformat()
         try:
-            response = (
+            response = await execute_query(
                 self.client.table("coach_daily_missions")
                 .update(
                     {
@@ -128,13 +273,12 @@ class DatabaseService:
                         "success_rate": round(success_rate, 3),
                         "rating": rating,
                         "completion_notes": notes,
-                        "completed_at": datetime.utcnow().isoformat(),
-                        "updated_at": datetime.utcnow().isoformat(),
+                        "completed_at": now_iso,
+                        "updated_at": now_iso,
                     }
                 )
                 .eq("user_id", user_id)
                 .eq("mission_date", mission_date)
-                .execute()
             )
             if response.data:
                 return response.data[0]
@@ -153,10 +297,10 @@ class DatabaseService:
                 "success_rate": round(success_rate, 3),
                 "rating": rating,
                 "completion_notes": notes,
-                "completed_at": datetime.utcnow().isoformat(),
-                "updated_at": datetime.utcnow().isoformat(),
+                "completed_at": now_iso,
+                "updated_at": now_iso,
             }
-            inserted = self.client.table("coach_daily_missions").insert(payload).execute()
+            inserted = await execute_query(self.client.table("coach_daily_missions").insert(payload))
             return inserted.data[0] if inserted.data else None
         except Exception:
             return None
@@ -164,13 +308,12 @@ class DatabaseService:
     async def get_coach_mission_history(self, user_id: str, limit: int = 60) -> list:
         """Get mission history for coaching adaptation."""
         try:
-            response = (
+            response = await execute_query(
                 self.client.table("coach_daily_missions")
                 .select("mission_payload,success_rate,rating,completed_at,mission_date")
                 .eq("user_id", user_id)
                 .order("mission_date", desc=False)
                 .limit(limit)
-                .execute()
             )
             return response.data or []
         except Exception:
@@ -186,7 +329,7 @@ class DatabaseService:
     ) -> Optional[dict]:
         """Persist user feedback for mnemonic quality tuning."""
         try:
-            response = (
+            response = await execute_query(
                 self.client.table("coach_mnemonic_feedback")
                 .insert(
                     {
@@ -197,7 +340,6 @@ class DatabaseService:
                         "comment": comment,
                     }
                 )
-                .execute()
             )
             return response.data[0] if response.data else None
         except Exception:
@@ -212,14 +354,15 @@ class DatabaseService:
         """Get average helpfulness for a mnemonic type."""
         try:
             rows = (
-                self.client.table("coach_mnemonic_feedback")
-                .select("helpfulness")
-                .eq("user_id", user_id)
-                .eq("error_code", error_code)
-                .eq("style", style)
-                .order("created_at", desc=True)
-                .limit(50)
-                .execute()
+                await execute_query(
+                    self.client.table("coach_mnemonic_feedback")
+                    .select("helpfulness")
+                    .eq("user_id", user_id)
+                    .eq("error_code", error_code)
+                    .eq("style", style)
+                    .order("created_at", desc=True)
+                    .limit(50)
+                )
             ).data or []
             if not rows:
                 return {"average_helpfulness": None, "samples": 0}
@@ -241,7 +384,7 @@ class DatabaseService:
     ) -> Optional[dict]:
         """Store coach behavior event."""
         try:
-            response = (
+            response = await execute_query(
                 self.client.table("coach_behavior_events")
                 .insert(
                     {
@@ -250,7 +393,6 @@ class DatabaseService:
                         "payload": payload or {},
                     }
                 )
-                .execute()
             )
             return response.data[0] if response.data else None
         except Exception:
@@ -259,13 +401,12 @@ class DatabaseService:
     async def list_behavior_events(self, user_id: str, limit: int = 100) -> list:
         """List recent behavior events."""
         try:
-            response = (
+            response = await execute_query(
                 self.client.table("coach_behavior_events")
                 .select("*")
                 .eq("user_id", user_id)
                 .order("created_at", desc=True)
                 .limit(limit)
-                .execute()
             )
             return response.data or []
         except Exception:
@@ -274,13 +415,12 @@ class DatabaseService:
     async def list_telegram_users(self, limit: int = 200) -> list:
         """List users connected with Telegram for notification jobs."""
         try:
-            response = (
+            response = await execute_query(
                 self.client.table("users")
                 .select("id,telegram_id,full_name,target_band,last_practice_at,current_streak_days,longest_streak_days,preferences")
                 .not_.is_("telegram_id", "null")
                 .order("updated_at", desc=False)
                 .limit(limit)
-                .execute()
             )
             return response.data or []
         except Exception:
@@ -296,7 +436,7 @@ class DatabaseService:
     ) -> Optional[dict]:
         """Save notification event with daily dedupe."""
         try:
-            response = (
+            response = await execute_query(
                 self.client.table("coach_notification_events")
                 .upsert(
                     {
@@ -308,7 +448,6 @@ class DatabaseService:
                     },
                     on_conflict="user_id,event_type,event_date",
                 )
-                .execute()
             )
             return response.data[0] if response.data else None
         except Exception:
@@ -322,14 +461,13 @@ class DatabaseService:
     ) -> Optional[dict]:
         """Get a notification event by user/type/date."""
         try:
-            response = (
+            response = await execute_query(
                 self.client.table("coach_notification_events")
                 .select("*")
                 .eq("user_id", user_id)
                 .eq("event_type", event_type)
                 .eq("event_date", event_date)
                 .limit(1)
-                .execute()
             )
             rows = response.data or []
             return rows[0] if rows else None
@@ -343,14 +481,13 @@ class DatabaseService:
     ) -> Optional[dict]:
         """Get latest notification event by type."""
         try:
-            response = (
+            response = await execute_query(
                 self.client.table("coach_notification_events")
                 .select("*")
                 .eq("user_id", user_id)
                 .eq("event_type", event_type)
                 .order("created_at", desc=True)
                 .limit(1)
-                .execute()
             )
             rows = response.data or []
             return rows[0] if rows else None
@@ -359,12 +496,11 @@ class DatabaseService:
 
     async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[dict]:
         """Get user profile by Telegram ID."""
-        response = (
+        response = await execute_query(
             self.client.table("users")
             .select("*")
             .eq("telegram_id", telegram_id)
             .limit(1)
-            .execute()
         )
         rows = response.data or []
         return rows[0] if rows else None
@@ -388,9 +524,11 @@ class DatabaseService:
             raise RuntimeError("SUPABASE_SERVICE_ROLE_KEY is required for Telegram auth user provisioning")
 
         email = f"telegram_{telegram_id}@telegram.speakmate.local"
-        auth_user_id = self._find_auth_user_id_by_email(email)
+        auth_user_id = await asyncio.to_thread(self._find_auth_user_id_by_email, email)
         if not auth_user_id:
-            auth_user_id = self._create_auth_user(email=email, full_name=full_name, telegram_id=telegram_id)
+            auth_user_id = await asyncio.to_thread(
+                self._create_auth_user, email=email, full_name=full_name, telegram_id=telegram_id
+            )
 
         upsert_payload = {
             "id": auth_user_id,
@@ -402,7 +540,13 @@ class DatabaseService:
             "telegram_username": username,
             "auth_provider": "telegram",
         }
-        self.client.table("users").upsert(upsert_payload, on_conflict="id").execute()
+        # Upsert returns the row, so no follow-up profile read is needed; a
+        # concurrent first login for the same user resolves on the id conflict.
+        response = await execute_query(self.client.table("users").upsert(upsert_payload, on_conflict="id"))
+        rows = response.data or []
+        await self._refresh_cached_profile(auth_user_id, rows[0] if rows else None)
+        if rows:
+            return rows[0]
 
         profile = await self.get_user_profile(auth_user_id)
         if not profile:
@@ -463,114 +607,194 @@ class DatabaseService:
             "mode": mode,
             "topic": topic,
             "duration_seconds": 0,
-            "created_at": datetime.utcnow().isoformat()
+            "created_at": _utcnow().isoformat()
         }
-        response = self.client.table("sessions").insert(data).execute()
+        response = await execute_query(self.client.table("sessions").insert(data))
+        await cache.delete(*_session_summary_cache_keys(user_id))
         return response.data[0] if response.data else None
     
     async def update_session(self, session_id: str, data: dict) -> dict:
         """Update session data."""
-        response = self.client.table("sessions").update(data).eq("id", session_id).execute()
+        _session_owner_cache.pop(str(session_id), None)
+        response = await execute_query(self.client.table("sessions").update(data).eq("id", session_id))
+        if response.data and response.data[0].get("user_id"):
+            await cache.delete(*_session_summary_cache_keys(str(response.data[0]["user_id"])))
         return response.data[0] if response.data else None
     
     async def get_session(self, session_id: str) -> Optional[dict]:
         """Get session by ID."""
-        response = self.client.table("sessions").select("*").eq("id", session_id).single().execute()
+        response = await execute_query(self.client.table("sessions").select("*").eq("id", session_id).single())
+        if response.data and response.data.get("user_id"):
+            _session_owner_cache[str(session_id)] = str(response.data["user_id"])
         return response.data if response.data else None
     
-    async def get_user_sessions(self, user_id: str, limit: int = 20) -> list:
-        """Get user's recent sessions."""
-        response = (
-            self.client.table("sessions")
-            .select("*")
-            .eq("user_id", user_id)
-            .order("created_at", desc=True)
-            .limit(limit)
-            .execute()
+    async def get_session_owner(self, session_id: str) -> Optional[str]:
+        """Get the owning user ID of a session (None if it does not exist)."""
+        key = str(session_id)
+        owner = _session_owner_cache.get(key)
+        if owner is not None:
+            return owner
+        response = await execute_query(
+            self.client.table("sessions").select("user_id").eq("id", key).limit(1)
         )
+        rows = response.data or []
+        if not rows or not rows[0].get("user_id"):
+            return None
+        owner = str(rows[0]["user_id"])
+        _session_owner_cache[key] = owner
+        return owner
+    
+    async def get_user_sessions(
+        self,
+        user_id: str,
+        limit: int = 20,
+        created_after: Optional[str] = None,
+        mode: Optional[str] = None,
+    ) -> list:
+        """Get user's recent sessions, optionally only those created at/after an ISO timestamp or of one mode."""
+        query = self.client.table("sessions").select("*").eq("user_id", user_id)
+        if created_after:
+            query = query.gte("created_at", created_after)
+        if mode:
+            query = query.eq("mode", mode)
+        response = await execute_query(query.order("created_at", desc=True).limit(limit))
         return response.data or []
     
+    async def get_user_sessions_slim(
+        self,
+        user_id: str,
+        limit: int = 20,
+        created_after: Optional[str] = None,
+    ) -> list:
+        """Get user's recent sessions with summary columns only (no transcripts/JSON state)."""
+        try:
+            query = self.client.table("sessions").select(SESSION_SUMMARY_COLUMNS).eq("user_id", user_id)
+            if created_after:
+                query = query.gte("created_at", created_after)
+            response = await execute_query(query.order("created_at", desc=True).limit(limit))
+            return response.data or []
+        except Exception:
+            return await self.get_user_sessions(user_id, limit=limit, created_after=created_after)
+
     # Conversation turns
     async def save_conversation_turn(self, session_id: str, turn: dict) -> dict:
         """Save a conversation turn."""
         turn["session_id"] = session_id
-        response = self.client.table("conversation_turns").insert(turn).execute()
+        response = await execute_query(self.client.table("conversation_turns").insert(turn))
         return response.data[0] if response.data else None
+
+    async def save_conversation_turns(self, session_id: str, turns: list[dict]) -> list:
+        """Save several conversation turns in one insert."""
+        if not turns:
+            return []
+        rows = [{**turn, "session_id": session_id} for turn in turns]
+        response = await execute_query(self.client.table("conversation_turns").insert(rows))
+        return response.data or []
     
     async def get_conversation_turns(self, session_id: str) -> list:
         """Get all turns for a session."""
-        response = (
+        response = await execute_query(
             self.client.table("conversation_turns")
             .select("*")
             .eq("session_id", session_id)
             .order("sequence_order")
-            .execute()
         )
         return response.data or []
+
+    async def get_conversation_turns_bulk(self, session_ids: list[str]) -> dict[str, list]:
+        """Get turns for many sessions in one query, grouped by session ID."""
+        if not session_ids:
+            return {}
+        turns_by_session: dict[str, list] = defaultdict(list)
+        offset = 0
+        columns = "session_id,role,transcription,content,word_timestamps,sequence_order"
+        # Page through results: PostgREST caps rows per response (1000 by default).
+        while True:
+            try:
+                response = await execute_query(
+                    self.client.table("conversation_turns")
+                    .select(columns)
+                    .in_("session_id", session_ids)
+                    .order("session_id")
+                    .order("sequence_order")
+                    .range(offset, offset + BULK_PAGE_SIZE - 1)
+                )
+            except Exception:
+                if columns == "*":
+                    raise
+                # Legacy schema has no word_timestamps column.
+                columns = "*"
+                continue
+            rows = response.data or []
+            for turn in rows:
+                turns_by_session[str(turn.get("session_id"))].append(turn)
+            if len(rows) < BULK_PAGE_SIZE:
+                break
+            offset += BULK_PAGE_SIZE
+        return dict(turns_by_session)
     
     # Error operations
     async def save_detected_error(self, session_id: str, error: dict) -> dict:
         """Save a detected error."""
         error["session_id"] = session_id
-        response = self.client.table("detected_errors").insert(error).execute()
+        response = await execute_query(self.client.table("detected_errors").insert(error))
         return response.data[0] if response.data else None
     
     async def save_detected_errors(self, session_id: str, errors: list) -> list:
         """Save multiple detected errors."""
         for error in errors:
             error["session_id"] = session_id
-        response = self.client.table("detected_errors").insert(errors).execute()
+        response = await execute_query(self.client.table("detected_errors").insert(errors))
         return response.data or []
     
     async def get_session_errors(self, session_id: str) -> list:
         """Get all errors for a session."""
-        response = (
+        response = await execute_query(
             self.client.table("detected_errors")
             .select("*")
             .eq("session_id", session_id)
-            .execute()
         )
         return response.data or []
     
     # Error profile operations
-    async def get_user_error_profile(self, user_id: str) -> list:
-        """Get user's error profile."""
-        response = (
+    async def get_user_error_profile(self, user_id: str, limit: Optional[int] = None) -> list:
+        """Get user's error profile, most frequent first."""
+        query = (
             self.client.table("error_profiles")
             .select("*")
             .eq("user_id", user_id)
             .order("occurrence_count", desc=True)
-            .execute()
         )
+        if limit:
+            query = query.limit(limit)
+        response = await execute_query(query)
         return response.data or []
     
     async def update_error_profile(self, user_id: str, category: str, subcategory: str) -> dict:
         """Update or create error profile entry."""
         # Check if exists
-        existing = (
+        existing = await execute_query(
             self.client.table("error_profiles")
             .select("*")
             .eq("user_id", user_id)
             .eq("category", category)
             .eq("subcategory", subcategory)
-            .execute()
         )
         
         if existing.data:
             # Update existing
             new_count = existing.data[0]["occurrence_count"] + 1
-            response = (
+            response = await execute_query(
                 self.client.table("error_profiles")
                 .update({
                     "occurrence_count": new_count,
-                    "last_occurred": datetime.utcnow().isoformat()
+                    "last_occurred": _utcnow().isoformat()
                 })
                 .eq("id", existing.data[0]["id"])
-                .execute()
             )
         else:
             # Create new
-            response = (
+            response = await execute_query(
                 self.client.table("error_profiles")
                 .insert({
                     "user_id": user_id,
@@ -578,13 +802,93 @@ class DatabaseService:
                     "subcategory": subcategory,
                     "occurrence_count": 1,
                     "improvement_rate": 0.0,
-                    "last_occurred": datetime.utcnow().isoformat()
+                    "last_occurred": _utcnow().isoformat()
                 })
-                .execute()
             )
         
         return response.data[0] if response.data else None
 
+    async def bulk_update_error_profile(self, user_id: str, counts: dict[tuple[str, str, str], int]) -> None:
+        """Add occurrence counts for many (category, subcategory, error_code) keys at once."""
+        if not counts:
+            return
+        # One round-trip upsert (migration_performance.sql)
+        try:
+            await execute_query(self.client.rpc("bump_error_profiles", {
+                "p_user_id": user_id,
+                "p_counts": [
+                    {"category": category, "subcategory": subcategory, "error_code": error_code, "count": count}
+                    for (category, subcategory, error_code), count in counts.items()
+                ],
+            }))
+            return
+        except Exception:
+            pass
+
+        # Fallback writes the legacy (category, subcategory) rows, like update_error_profile
+        legacy_counts = defaultdict(int)
+        for (category, subcategory, _), count in counts.items():
+            legacy_counts[(category, subcategory)] += count
+        counts = legacy_counts
+
+        existing = await execute_query(
+            self.client.table("error_profiles")
+            .select("id,category,subcategory,occurrence_count")
+            .eq("user_id", user_id)
+            .in_("category", list({category for category, _ in counts}))
+        )
+        existing_by_key = {
+            (row["category"], row["subcategory"]): row for row in existing.data or []
+        }
+        now_iso = _utcnow().isoformat()
+        updates = []
+        new_rows = []
+        for key, count in counts.items():
+            row = existing_by_key.get(key)
+            if row:
+                updates.append(execute_query(
+                    self.client.table("error_profiles")
+                    .update({
+                        "occurrence_count": (row.get("occurrence_count") or 0) + count,
+                        "last_occurred": now_iso
+                    })
+                    .eq("id", row["id"])
+                ))
+            else:
+                new_rows.append({
+                    "user_id": user_id,
+                    "category": key[0],
+                    "subcategory": key[1],
+                    "occurrence_count": count,
+                    "improvement_rate": 0.0,
+                    "last_occurred": now_iso
+                })
+        if new_rows:
+            updates.append(execute_query(self.client.table("error_profiles").insert(new_rows)))
+        await asyncio.gather(*updates)
+
+    # Storage operations
+    async def upload_storage_file(self, object_path: str, local_path: str, content_type: str) -> None:
+        """Upload (or replace) a local file in the assets bucket."""
+        bucket = self.client.storage.from_(settings.STORAGE_BUCKET)
+        await asyncio.to_thread(
+            bucket.upload,
+            object_path,
+            local_path,
+            {"content-type": content_type, "upsert": "true"},
+        )
+
+    async def delete_storage_file(self, object_path: str) -> None:
+        """Remove an object from the assets bucket (missing objects are ignored)."""
+        bucket = self.client.storage.from_(settings.STORAGE_BUCKET)
+        await asyncio.to_thread(bucket.remove, [object_path])
+
+    async def create_signed_storage_url(self, object_path: str, expires_in: int) -> Optional[str]:
+        """Short-lived download URL for an object in the assets bucket."""
+        bucket = self.client.storage.from_(settings.STORAGE_BUCKET)
+        response = await asyncio.to_thread(bucket.create_signed_url, object_path, expires_in)
+        return response.get("signedURL") or response.get("signedUrl")
+
 
 # Global instance
 db_service = DatabaseService()
@@ -10,11 +10,12 @@ IELTS Speaking Coach with:
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 import logging
 import sys
 
 from app.core.config import settings
+from app.core.cache import cache
 from app.api.routes import users, sessions, feedback, auth
 from app.api.routes import training, analysis, coach
 from app.api.websocket.conversation import router as ws_router
@@ -52,6 +53,18 @@ async def lifespan(app: FastAPI):
     if telegram_import_error:
         logger.warning(f"Telegram module unavailable: {telegram_import_error}")
     
+    # Create the shared Supabase client and open its pooled connection up
+    # front so the first request does not pay for the TLS handshake. The
+    # errors-table and run-type probes are cheap one-row reads and cache the
+    # schema too.
+    if settings.SUPABASE_URL:
+        try:
+            from app.db.supabase import db_service
+            await db_service.get_errors_table()
+            await db_service.get_run_type_column()
+        except Exception as e:
+            logger.error(f"Supabase client initialization failed: {e}")
+    
     # Initialize services
     try:
         # Initialize Redis if enabled
@@ -94,6 +107,10 @@ async def lifespan(app: FastAPI):
     if settings.TELEGRAM_BOT_TOKEN and telegram_router is not None:
         from app.telegram.bot import shutdown_bot
         await shutdown_bot()
+    await cache.close()
+    if settings.SUPABASE_URL:
+        from app.db.supabase import close_supabase_client
+        close_supabase_client()
     logger.info("Shutting down application")
 
 
@@ -103,6 +120,7 @@ app = FastAPI(
     version=settings.APP_VERSION,
     description="AI-powered IELTS Speaking Coach",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/docs" if settings.DEBUG else None,
     redoc_url="/redoc" if settings.DEBUG else None
 )
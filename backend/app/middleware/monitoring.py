@@ -140,6 +140,8 @@ class MetricNames:
     STT_DURATION = "speakmate_stt_duration_seconds"
     TTS_DURATION = "speakmate_tts_duration_seconds"
     LLM_DURATION = "speakmate_llm_duration_seconds"
+    
+    PDF_QUEUE_DEPTH = "speakmate_pdf_queue_depth"
 
 
 class RequestTracingMiddleware(BaseHTTPMiddleware):
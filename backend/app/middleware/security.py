@@ -17,7 +17,7 @@ import re
 import hashlib
 import time
 
-from app.db.supabase import db_service
+from app.db.supabase import db_service, execute_query
 
 logger = logging.getLogger(__name__)
 
@@ -324,14 +324,14 @@ class AuditLogger:
         try:
             client = db_service.client
             
-            client.table("audit_log").insert({
+            await execute_query(client.table("audit_log").insert({
                 "action": entry["action"],
                 "user_id": entry["user_id"],
                 "resource_type": entry["resource_type"],
                 "resource_id": entry["resource_id"],
                 "details": entry["details"],
                 "ip_address": entry["ip_address"]
-            }).execute()
+            }))
             
         except Exception as e:
             logger.error(f"Failed to save audit log: {e}")
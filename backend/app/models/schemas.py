@@ -125,6 +125,15 @@ class IELTSScore(BaseModel):
     overall_band: float = Field(ge=0, le=9)
 
 
+class LegacySessionScores(BaseModel):
+    """IELTS scores read from pre-overall_scores session columns."""
+    overall_band: Optional[float] = Field(None, validation_alias="overall_score")
+    fluency_coherence: Optional[float] = Field(None, validation_alias="fluency_score")
+    lexical_resource: Optional[float] = Field(None, validation_alias="vocabulary_score")
+    grammatical_range: Optional[float] = Field(None, validation_alias="grammar_score")
+    pronunciation: Optional[float] = Field(None, validation_alias="pronunciation_score")
+
+
 # WebSocket message schemas
 class WSMessage(BaseModel):
     type: str
@@ -70,15 +70,24 @@ def _parse_dt(value: Any) -> Optional[datetime]:
     if not isinstance(value, str) or not value:
         return None
     try:
-        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return datetime.fromisoformat(value)
     except ValueError:
         return None
 
 
+_WORD_RE = re.compile(r"[A-Za-z']+")
+# Single-word fillers need word boundaries ("like" but not "likely");
+# multi-word phrases are counted as plain substrings.
+_FILLER_WORD_RE = re.compile(
+    r"\b(?:" + "|".join(term for term in FILLER_TERMS if " " not in term) + r")\b"
+)
+_FILLER_PHRASES = tuple(term for term in FILLER_TERMS if " " in term)
+
+
 def _count_words(text: str) -> int:
     if not text:
         return 0
-    return len(re.findall(r"[A-Za-z']+", text))
+    return len(_WORD_RE.findall(text))
 
 
 def _count_fillers(text: str) -> int:
@@ -86,12 +95,9 @@ def _count_fillers(text: str) -> int:
         return 0
 
     lowered = text.lower()
-    total = 0
-    for term in FILLER_TERMS:
-        if " " in term:
-            total += lowered.count(term)
-        else:
-            total += len(re.findall(rf"\b{re.escape(term)}\b", lowered))
+    total = len(_FILLER_WORD_RE.findall(lowered))
+    for phrase in _FILLER_PHRASES:
+        total += lowered.count(phrase)
     return total
 
 
@@ -106,6 +112,29 @@ def _safe_div(num: float, den: float) -> float:
     return num / den if den else 0.0
 
 
+MISSION_STATS_WINDOW = 14
+
+
+def build_mission_stats(mission_history: list[dict]) -> dict:
+    """Rolling completion aggregate over the last MISSION_STATS_WINDOW missions."""
+    recent = mission_history[-MISSION_STATS_WINDOW:]
+    return {
+        "last14_sum": sum(_safe_float(item.get("success_rate")) for item in recent),
+        "last14_count": len(recent),
+    }
+
+
+def mission_completion_rate(coach_state: dict) -> Optional[float]:
+    """Average success rate of recent missions, or None when there are none."""
+    stats = coach_state.get("mission_stats")
+    if not isinstance(stats, dict) or "last14_count" not in stats:
+        stats = build_mission_stats(coach_state.get("mission_history", []))
+    count = int(stats.get("last14_count") or 0)
+    if not count:
+        return None
+    return round(_safe_float(stats.get("last14_sum")) / count, 2)
+
+
 class CoachEngine:
     """High-level coaching intelligence used by Super Coach endpoints."""
 
@@ -657,6 +686,19 @@ class CoachEngine:
         history = coach.setdefault("mission_history", [])
 
         success_rate = round(_safe_div(tasks_completed, max(total_tasks, 1)), 2)
+
+        stats = coach.get("mission_stats")
+        window = min(len(history), MISSION_STATS_WINDOW)
+        if not isinstance(stats, dict) or stats.get("last14_count") != window:
+            stats = build_mission_stats(history)
+        # Ring-buffer update: the oldest mission leaves the window as this one enters.
+        last14_sum = _safe_float(stats.get("last14_sum")) + success_rate
+        last14_count = window + 1
+        if window == MISSION_STATS_WINDOW:
+            last14_sum -= _safe_float(history[-MISSION_STATS_WINDOW].get("success_rate"))
+            last14_count = window
+        coach["mission_stats"] = {"last14_sum": round(last14_sum, 4), "last14_count": last14_count}
+
         history.append({
             "mission_id": mission_id,
             "tasks_completed": tasks_completed,
@@ -2,12 +2,29 @@
 SpeakMate AI - Gemini Conversation Service
 """
 import google.generativeai as genai
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 import json
 import os
 
 from app.core.config import settings
 
+# Turns of history included in the reply prompt; keeps prompt size constant
+# however long the session runs.
+HISTORY_WINDOW = 6
+
+FALLBACK_RESPONSE = "That's interesting! Could you tell me more about your thoughts on this?"
+
+# Static opening lines by topic keyword; the greeting needs no model call.
+GREETINGS = {
+    "general": "Hello! It's great to chat with you today. What would you like to talk about?",
+    "work": "Hi there! I'd love to hear about your work. What do you do for a living?",
+    "education": "Hello! Let's talk about education. Are you currently studying or have you finished your studies?",
+    "travel": "Hi! I love talking about travel. Have you been anywhere interesting recently?",
+    "technology": "Hello! Technology is such a fascinating topic. What kind of technology do you use most often?",
+    "hobbies": "Hi there! I'm curious about your hobbies. What do you like to do in your free time?",
+    "environment": "Hello! Let's discuss the environment. What environmental issues concern you the most?",
+}
+
 
 class ConversationService:
     """Gemini-powered conversation service."""
@@ -46,23 +63,13 @@ class ConversationService:
     
     async def generate_greeting(self, topic: str = "general") -> str:
         """Generate initial conversation greeting."""
-        
-        greetings = {
-            "general": "Hello! It's great to chat with you today. What would you like to talk about?",
-            "work": "Hi there! I'd love to hear about your work. What do you do for a living?",
-            "education": "Hello! Let's talk about education. Are you currently studying or have you finished your studies?",
-            "travel": "Hi! I love talking about travel. Have you been anywhere interesting recently?",
-            "technology": "Hello! Technology is such a fascinating topic. What kind of technology do you use most often?",
-            "hobbies": "Hi there! I'm curious about your hobbies. What do you like to do in your free time?",
-            "environment": "Hello! Let's discuss the environment. What environmental issues concern you the most?",
-        }
-        
         # Find matching topic or use general
-        for key in greetings:
-            if key in topic.lower():
-                return greetings[key]
+        topic = topic.lower()
+        for key, greeting in GREETINGS.items():
+            if key in topic:
+                return greeting
         
-        return greetings["general"]
+        return GREETINGS["general"]
     
     async def generate_response(
         self,
@@ -84,46 +91,94 @@ class ConversationService:
             AI response text
         """
         if not self.model:
-            # Mock responses for development
-            mock_responses = [
-                "That's really interesting! Can you tell me more about that?",
-                "I see. What made you feel that way?",
-                "That sounds wonderful! How long have you been doing that?",
-                "Interesting perspective! Have you always thought that way?",
-                "I understand. What do you think will happen in the future?",
-            ]
-            import random
-            return random.choice(mock_responses)
+            return self._mock_response()
+        
+        prompt = self._build_response_prompt(user_message, conversation_history, topic, user_level)
+        
+        try:
+            response = self.model.generate_content(prompt)
+            return response.text.strip()
+        except Exception as e:
+            print(f"Gemini response error: {e}")
+            return FALLBACK_RESPONSE
+    
+    async def stream_response(
+        self,
+        user_message: str,
+        conversation_history: List[dict],
+        topic: str = "general",
+        user_level: str = "B1"
+    ) -> AsyncIterator[str]:
+        """
+        Stream the conversational response as text chunks.
         
+        Same prompt as generate_response; chunks are yielded as Gemini
+        produces them so the first words reach the client early.
+        """
+        if not self.model:
+            yield self._mock_response()
+            return
+        
+        prompt = self._build_response_prompt(user_message, conversation_history, topic, user_level)
+        
+        produced = False
+        try:
+            response = await self.model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunk without text parts (e.g. safety-blocked)
+                    continue
+                if text:
+                    produced = True
+                    yield text
+        except Exception as e:
+            print(f"Gemini streaming error: {e}")
+        
+        if not produced:
+            yield FALLBACK_RESPONSE
+    
+    def _mock_response(self) -> str:
+        # Mock responses for development
+        mock_responses = [
+            "That's really interesting! Can you tell me more about that?",
+            "I see. What made you feel that way?",
+            "That sounds wonderful! How long have you been doing that?",
+            "Interesting perspective! Have you always thought that way?",
+            "I understand. What do you think will happen in the future?",
+        ]
+        import random
+        return random.choice(mock_responses)
+    
+    def _build_response_prompt(
+        self,
+        user_message: str,
+        conversation_history: List[dict],
+        topic: str,
+        user_level: str
+    ) -> str:
         # Format conversation history
         history_text = "\n".join([
             f"{turn['role'].upper()}: {turn['content']}"
-            for turn in conversation_history[-6:]  # Last 6 turns for context
+            for turn in conversation_history[-HISTORY_WINDOW:]
         ])
         
         # Build prompt
         prompt = self.prompts.get("conversation", "")
         if prompt:
-            prompt = prompt.format(
+            return prompt.format(
                 topic=topic,
                 level=user_level,
                 history=history_text
             )
-        else:
-            prompt = f"""You are a friendly English conversation partner. 
+        return f"""You are a friendly English conversation partner. 
 The user said: "{user_message}"
 Topic: {topic}
 User level: {user_level}
 
 Respond naturally in 2-3 sentences. Ask a follow-up question to keep the conversation going.
 Do NOT correct any grammar mistakes - just have a natural conversation."""
-        
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
-            print(f"Gemini response error: {e}")
-            return "That's interesting! Could you tell me more about your thoughts on this?"
     
     async def generate_ielts_question(
         self,
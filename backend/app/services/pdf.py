@@ -13,6 +13,7 @@ from reportlab.graphics.shapes import Drawing, Rect
 from reportlab.graphics.charts.barcharts import VerticalBarChart
 from datetime import datetime
 from typing import List, Optional
+import asyncio
 import os
 import io
 
@@ -87,7 +88,7 @@ class PDFGenerator:
         Generate PDF report for a session.
         
         Args:
-            report_data: dict containing session, user, errors, conversation
+            report_data: dict containing session, user, errors
         
         Returns:
             Path to generated PDF
@@ -95,15 +96,17 @@ class PDFGenerator:
         session = report_data.get("session", {})
         user = report_data.get("user", {})
         errors = report_data.get("errors", [])
-        conversation = report_data.get("conversation", [])
         include_details = report_data.get("include_details", True)
         
         session_id = session.get("id", "unknown")
         pdf_path = f"reports/{session_id}.pdf"
+        # Written beside the target and moved into place, so a download never
+        # sees a half-written report
+        tmp_path = f"{pdf_path}.tmp"
         
         # Create document
         doc = SimpleDocTemplate(
-            pdf_path,
+            tmp_path,
             pagesize=A4,
             rightMargin=72,
             leftMargin=72,
@@ -158,8 +161,9 @@ class PDFGenerator:
             self.styles['Italic']
         ))
         
-        # Build PDF
-        doc.build(story)
+        # Build PDF (layout is CPU-bound; keep it off the event loop)
+        await asyncio.to_thread(doc.build, story)
+        os.replace(tmp_path, pdf_path)
         
         return pdf_path
     
@@ -437,7 +441,7 @@ class PDFGenerator:
                 story.append(Spacer(1, 15))
         
         # Build PDF
-        doc.build(story)
+        await asyncio.to_thread(doc.build, story)
         
         return pdf_path
 
@@ -11,7 +11,7 @@ from datetime import datetime, timedelta
 from dataclasses import dataclass
 import logging
 
-from app.db.supabase import db_service
+from app.db.supabase import db_service, execute_query
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -208,7 +208,7 @@ class QuotaService:
         """Get user's plan data from database."""
         try:
             client = db_service.client
-            response = client.table('user_plans').select('*').eq('user_id', user_id).single().execute()
+            response = await execute_query(client.table('user_plans').select('*').eq('user_id', user_id).single())
             return response.data if response.data else {'plan': 'free'}
         except:
             return {'plan': 'free'}
@@ -6,9 +6,139 @@ from google.cloud import texttospeech_v1 as tts
 from typing import Optional, AsyncIterator
 import asyncio
 import io
+import time
 
 from app.core.config import settings
 
+# Partials re-transcribe the current window of the utterance. Once a window
+# holds PARTIAL_WINDOW_SECONDS of audio its hypothesis is committed and the
+# next clean chunk starts a new window, so each request stays short. Windows
+# that cannot be restarted stop producing partials at PARTIAL_MAX_SECONDS,
+# below the 60 s limit of synchronous recognize; the final chunk still
+# produces the full transcript.
+PARTIAL_WINDOW_SECONDS = 15.0
+PARTIAL_MAX_SECONDS = 50.0
+# At most one partial request per interval; skipped chunks are still buffered.
+PARTIAL_MIN_INTERVAL_SECONDS = 5.0
+
+WEBM_MAGIC = b'\x1a\x45\xdf\xa3'
+WEBM_CLUSTER_ID = b'\x1f\x43\xb6\x75'
+OGG_MAGIC = b'OggS'
+
+
+def _stream_header(first_chunk: bytes) -> Optional[bytes]:
+    """
+    Container header to put in front of a restarted window.
+    
+    WebM: everything before the first Cluster. Ogg: the OpusHead and
+    OpusTags pages. Raw PCM needs none. None if the header is not complete
+    in the first chunk.
+    """
+    if first_chunk[:4] == WEBM_MAGIC:
+        end = first_chunk.find(WEBM_CLUSTER_ID)
+        return first_chunk[:end] if end > 0 else None
+    if first_chunk[:4] == OGG_MAGIC:
+        end = first_chunk.find(OGG_MAGIC, 4)
+        end = first_chunk.find(OGG_MAGIC, end + 4) if end > 0 else -1
+        return first_chunk[:end] if end > 0 else None
+    return b""
+
+
+class PartialTranscript:
+    """
+    Audio and hypotheses for the utterance currently being spoken.
+    
+    Uses LocalAgreement-2: a word is confirmed once two consecutive
+    hypotheses over the growing buffer agree on it, so confirmed text
+    does not flicker as more audio arrives. Words of earlier windows are
+    kept in `committed_words`.
+    """
+    
+    def __init__(self):
+        # Audio of the current window (the stream header is sent separately
+        # once the window has been restarted)
+        self.audio = bytearray()
+        self.header: Optional[bytes] = None
+        self.restarted = False
+        self.previous_words: list[str] = []
+        self.confirmed_words: list[str] = []
+        self.committed_words: list[str] = []
+        # Monotonic clock estimates; clients stream in real time
+        self.window_started_at: Optional[float] = None
+        self.last_chunk_at: Optional[float] = None
+        self.last_request_at: Optional[float] = None
+        self.chunk_count = 0
+        # Window length covered by previous_words
+        self.hypothesis_bytes = 0
+    
+    @property
+    def duration(self) -> float:
+        """Approximate seconds of audio in the current window."""
+        if self.window_started_at is None:
+            return 0.0
+        return self.last_chunk_at - self.window_started_at
+    
+    def window_bytes(self) -> bytes:
+        if self.restarted:
+            return self.header + self.audio
+        return bytes(self.audio)
+    
+    def add_chunk(self, chunk: bytes, now: float):
+        """Buffer a chunk, restarting the window first when it is full."""
+        if self.chunk_count == 0:
+            self.header = _stream_header(chunk)
+            # Placeholder until the second chunk shows the chunk length
+            self.window_started_at = now
+        elif self.chunk_count == 1:
+            # The first chunk was recorded over the same span as the second
+            self.window_started_at -= now - self.last_chunk_at
+        elif self._can_restart(chunk):
+            # The last hypothesis covers exactly the audio before this chunk
+            self.committed_words.extend(self.previous_words)
+            self.previous_words = []
+            self.confirmed_words = []
+            self.audio.clear()
+            self.hypothesis_bytes = 0
+            self.restarted = True
+            self.window_started_at = self.last_chunk_at
+        self.audio.extend(chunk)
+        self.chunk_count += 1
+        self.last_chunk_at = now
+    
+    def _can_restart(self, chunk: bytes) -> bool:
+        if self.header is None or self.duration < PARTIAL_WINDOW_SECONDS:
+            return False
+        if self.hypothesis_bytes != len(self.audio):
+            return False
+        if self.header[:4] == WEBM_MAGIC:
+            return chunk[:4] == WEBM_CLUSTER_ID
+        if self.header[:4] == OGG_MAGIC:
+            return chunk[:4] == OGG_MAGIC
+        return True
+    
+    def should_request(self, now: float) -> bool:
+        """Throttle partial requests and stop once the window is too long."""
+        if self.duration > PARTIAL_MAX_SECONDS:
+            return False
+        return self.last_request_at is None or now - self.last_request_at >= PARTIAL_MIN_INTERVAL_SECONDS
+    
+    def agree(self, words: list[str]) -> list[str]:
+        """Record a new hypothesis and return the confirmed text so far."""
+        agreed = []
+        for previous, current in zip(self.previous_words, words):
+            if previous != current:
+                break
+            agreed.append(current)
+        # Confirmed words are never retracted
+        if len(agreed) > len(self.confirmed_words) and agreed[:len(self.confirmed_words)] == self.confirmed_words:
+            self.confirmed_words = agreed
+        self.previous_words = words
+        self.hypothesis_bytes = len(self.audio)
+        return self.committed_words + self.confirmed_words
+    
+    def reset(self):
+        self.__init__()
+
 
 class SpeechService:
     """Google Cloud Speech-to-Text and Text-to-Speech service."""
@@ -102,8 +232,8 @@ class SpeechService:
         audio = speech.RecognitionAudio(content=audio_data)
         
         try:
-            # Perform synchronous recognition for short audio
-            response = self.speech_client.recognize(config=config, audio=audio)
+            # Synchronous recognition for short audio, off the event loop
+            response = await asyncio.to_thread(self.speech_client.recognize, config=config, audio=audio)
             
             if response.results:
                 result = response.results[0]
@@ -142,6 +272,28 @@ class SpeechService:
                 "error": str(e)
             }
     
+    async def transcribe_partial(self, state: PartialTranscript, chunk: bytes) -> dict:
+        """
+        Add a non-final chunk to the utterance and transcribe its current window.
+        
+        Returns the latest hypothesis as `text` and the stable prefix as
+        `confirmed_text`. Throttled chunks only report the confirmed text.
+        """
+        now = time.monotonic()
+        state.add_chunk(chunk, now)
+        if not state.should_request(now):
+            confirmed = " ".join(state.committed_words + state.confirmed_words)
+            return {"text": confirmed, "confirmed_text": confirmed, "is_final": False, "confidence": 0}
+        
+        state.last_request_at = now
+        result = await self.transcribe_audio(state.window_bytes(), is_final=False)
+        words = (result.get("text") or "").split()
+        confirmed = state.agree(words)
+        result["text"] = " ".join(state.committed_words + words)
+        result["confirmed_text"] = " ".join(confirmed)
+        result["is_final"] = False
+        return result
+    
     async def transcribe_stream(
         self,
         audio_generator: AsyncIterator[bytes],
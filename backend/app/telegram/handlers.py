@@ -6,7 +6,7 @@ from aiogram import Router, F
 from aiogram.filters import Command, CommandStart
 from aiogram.types import Message, CallbackQuery
 
-from app.db.supabase import db_service
+from app.db.supabase import db_service, execute_query
 from app.telegram.keyboards import (
     main_menu_keyboard,
     start_inline_keyboard,
@@ -177,12 +177,11 @@ async def callback_help(callback: CallbackQuery):
 async def _find_user_by_telegram_id(telegram_id: int) -> dict | None:
     """Find user by Telegram ID."""
     try:
-        response = (
+        response = await execute_query(
             db_service.client.table("users")
             .select("*")
             .eq("telegram_id", telegram_id)
             .single()
-            .execute()
         )
         return response.data if response.data else None
     except Exception:
@@ -0,0 +1,459 @@
+-- =============================================
+-- SpeakMate AI - Performance Migration
+-- =============================================
+-- Adds server-side aggregation functions, views and indexes used by hot API
+-- reads. Run after schema_production.sql. The API falls back to its previous
+-- client-side queries when these objects are not installed yet.
+
+-- -----------------------------------------------------------------
+-- Analysis summary (GET /analysis/user/summary)
+-- -----------------------------------------------------------------
+CREATE INDEX IF NOT EXISTS idx_errors_session ON public.error_instances(session_id);
+
+CREATE OR REPLACE FUNCTION public.user_analysis_summary(
+    p_user_id UUID,
+    p_since TIMESTAMP WITH TIME ZONE
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_summary JSONB;
+    v_error_counts JSONB;
+BEGIN
+    -- Aggregates are computed here so the payload size does not grow with
+    -- the number of sessions beyond the trend points. Structured scores win;
+    -- legacy overall_score is read via to_jsonb so the function works whether
+    -- or not that column exists. Errors come from the session_errors view
+    -- (created below) so legacy detected_errors rows are counted the same way
+    -- as in the API fallback.
+    WITH bands AS (
+        SELECT
+            s.created_at,
+            COALESCE(
+                s.overall_scores->>'overall_band',
+                to_jsonb(s)->>'overall_score'
+            )::NUMERIC AS band
+        FROM public.sessions s
+        WHERE s.user_id = p_user_id
+          AND s.created_at >= p_since
+    )
+    SELECT jsonb_build_object(
+        'sessions_count', COUNT(*),
+        'average_score', AVG(band),
+        'improvement', CASE
+            WHEN COUNT(band) >= 2 THEN
+                (array_agg(band ORDER BY created_at DESC) FILTER (WHERE band IS NOT NULL))[1]
+                - (array_agg(band ORDER BY created_at) FILTER (WHERE band IS NOT NULL))[1]
+        END,
+        'score_trend', COALESCE(
+            jsonb_agg(jsonb_build_object('date', created_at, 'score', band) ORDER BY created_at),
+            '[]'::jsonb
+        )
+    )
+    INTO v_summary
+    FROM bands;
+
+    SELECT COALESCE(
+        jsonb_agg(jsonb_build_object('category', category, 'count', error_count) ORDER BY error_count DESC),
+        '[]'::jsonb
+    )
+    INTO v_error_counts
+    FROM (
+        SELECT COALESCE(e.category, 'other') AS category, COUNT(*) AS error_count
+        FROM public.session_errors e
+        JOIN public.sessions s ON s.id = e.session_id
+        WHERE s.user_id = p_user_id
+          AND s.created_at >= p_since
+        GROUP BY 1
+    ) grouped;
+
+    RETURN v_summary || jsonb_build_object('error_counts', v_error_counts);
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- -----------------------------------------------------------------
+-- Session errors across current and legacy tables
+-- -----------------------------------------------------------------
+-- One view so the API reads error rows in a single call. Legacy
+-- detected_errors rows are only included for sessions that have no
+-- error_instances, matching the API's previous fallback order.
+DO $$
+DECLARE
+    v_instances TEXT := '
+        SELECT e.id, e.session_id, e.analysis_run_id,
+               e.category::TEXT AS category, e.subcategory, e.error_code,
+               e.severity::TEXT AS severity, e.original_text, e.corrected_text,
+               e.explanation, e.evidence, e.confidence::NUMERIC AS confidence,
+               e.impact_score::NUMERIC AS impact_score, e.fix_drill_id,
+               e.timestamp_ms, e.created_at
+        FROM public.error_instances e';
+    v_legacy TEXT := '
+        SELECT d.id, d.session_id, NULL::UUID,
+               d.category, d.subcategory, NULL::TEXT,
+               NULL::TEXT, d.original_text, d.corrected_text,
+               d.explanation, ''{}''::JSONB, d.confidence::NUMERIC,
+               NULL::NUMERIC, NULL::UUID,
+               d.timestamp_ms, d.created_at
+        FROM public.detected_errors d';
+    v_body TEXT;
+BEGIN
+    IF to_regclass('public.error_instances') IS NOT NULL
+       AND to_regclass('public.detected_errors') IS NOT NULL THEN
+        v_body := v_instances || ' UNION ALL ' || v_legacy || '
+        WHERE NOT EXISTS (
+            SELECT 1 FROM public.error_instances ei WHERE ei.session_id = d.session_id
+        )';
+    ELSIF to_regclass('public.error_instances') IS NOT NULL THEN
+        v_body := v_instances;
+    ELSE
+        v_body := v_legacy;
+    END IF;
+
+    EXECUTE 'CREATE OR REPLACE VIEW public.session_errors WITH (security_invoker = true) AS ' || v_body;
+END $$;
+
+-- Covering index for coach error reads (session_id IN (...) selecting
+-- category/error_code/created_at) so they can be served index-only.
+CREATE INDEX IF NOT EXISTS idx_errors_session_covering
+    ON public.error_instances(session_id) INCLUDE (category, error_code, created_at);
+
+-- -----------------------------------------------------------------
+-- Latest analysis run per type (GET /analysis/sessions/{id}, /scores)
+-- -----------------------------------------------------------------
+CREATE INDEX IF NOT EXISTS idx_analysis_session_type_created
+    ON public.analysis_runs(session_id, run_type, created_at DESC);
+
+-- -----------------------------------------------------------------
+-- Mnemonic drill persistence (coach mnemonic endpoints)
+-- -----------------------------------------------------------------
+-- At most one active mnemonic drill per (user, error_code). Older active
+-- duplicates are suspended first so the unique index can be built.
+UPDATE public.training_tasks t
+SET status = 'suspended'
+WHERE t.task_type = 'mnemonic_drill'
+  AND t.status = 'active'
+  AND EXISTS (
+      SELECT 1
+      FROM public.training_tasks newer
+      WHERE newer.user_id = t.user_id
+        AND newer.error_code = t.error_code
+        AND newer.task_type = 'mnemonic_drill'
+        AND newer.status = 'active'
+        AND (newer.created_at, newer.id) > (t.created_at, t.id)
+  );
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_training_active_mnemonic
+    ON public.training_tasks(user_id, error_code)
+    WHERE task_type = 'mnemonic_drill' AND status = 'active';
+
+-- Bulk upsert of mnemonic drills in one statement. PostgREST upserts cannot
+-- target a partial unique index, hence the RPC.
+-- p_tasks: [{"error_code": "...", "content": {...}}, ...]
+CREATE OR REPLACE FUNCTION public.upsert_mnemonic_tasks(
+    p_user_id UUID,
+    p_tasks JSONB
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_created INTEGER;
+    v_updated INTEGER;
+BEGIN
+    WITH input AS (
+        SELECT DISTINCT ON (t->>'error_code')
+            t->>'error_code' AS error_code,
+            t->'content' AS content
+        FROM jsonb_array_elements(p_tasks) t
+        WHERE COALESCE(t->>'error_code', '') <> ''
+    ),
+    upserted AS (
+        INSERT INTO public.training_tasks (
+            user_id, task_type, error_code, content,
+            difficulty, interval_days, ease_factor, next_due_at, status
+        )
+        SELECT
+            p_user_id, 'mnemonic_drill', error_code, content,
+            0.4, 1, 2.5, NOW() + INTERVAL '1 day', 'active'
+        FROM input
+        ON CONFLICT (user_id, error_code) WHERE task_type = 'mnemonic_drill' AND status = 'active'
+        DO UPDATE SET
+            content = EXCLUDED.content,
+            next_due_at = EXCLUDED.next_due_at,
+            difficulty = EXCLUDED.difficulty,
+            interval_days = EXCLUDED.interval_days
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT
+        COUNT(*) FILTER (WHERE inserted),
+        COUNT(*) FILTER (WHERE NOT inserted)
+    INTO v_created, v_updated
+    FROM upserted;
+
+    RETURN jsonb_build_object('created', v_created, 'updated', v_updated);
+END;
+$$ LANGUAGE plpgsql;
+
+-- -----------------------------------------------------------------
+-- Training plan error profile (GET /training/plan)
+-- -----------------------------------------------------------------
+-- Error counts by code over the user's most recent sessions, grouped in
+-- Postgres instead of shipping every error row to the API.
+CREATE OR REPLACE FUNCTION public.get_recent_error_profile(
+    p_user_id UUID,
+    p_session_limit INTEGER DEFAULT 10
+)
+RETURNS TABLE (error_code TEXT, count INTEGER) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT COALESCE(e.error_code, 'GRAM_OTHER')::TEXT, COUNT(*)::INTEGER
+    FROM public.error_instances e
+    WHERE e.session_id IN (
+        SELECT s.id
+        FROM public.sessions s
+        WHERE s.user_id = p_user_id
+        ORDER BY s.created_at DESC
+        LIMIT p_session_limit
+    )
+    GROUP BY 1;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- -----------------------------------------------------------------
+-- Weekly summary (GET /feedback/summary/weekly)
+-- -----------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.weekly_summary(
+    p_user_id UUID,
+    p_days INTEGER DEFAULT 7
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_summary JSONB;
+    v_top_issues JSONB;
+BEGIN
+    SELECT jsonb_build_object(
+        'sessions_count', COUNT(*),
+        'total_minutes', COALESCE(SUM(s.duration_seconds), 0) / 60,
+        'average_band', AVG((s.overall_scores->>'overall_band')::NUMERIC)
+    )
+    INTO v_summary
+    FROM public.sessions s
+    WHERE s.user_id = p_user_id
+      AND s.created_at >= NOW() - make_interval(days => p_days);
+
+    SELECT COALESCE(
+        jsonb_agg(jsonb_build_object(
+            'category', p.category,
+            'subcategory', p.subcategory,
+            'count', p.occurrence_count
+        ) ORDER BY p.occurrence_count DESC),
+        '[]'::jsonb
+    )
+    INTO v_top_issues
+    FROM (
+        SELECT category::TEXT AS category, subcategory, occurrence_count
+        FROM public.error_profiles
+        WHERE user_id = p_user_id
+        ORDER BY occurrence_count DESC NULLS LAST
+        LIMIT 3
+    ) p;
+
+    RETURN v_summary || jsonb_build_object('top_issues', v_top_issues);
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- -----------------------------------------------------------------
+-- Learning statistics (GET /users/me/stats)
+-- -----------------------------------------------------------------
+-- Totals and average band over the user's most recent sessions; the
+-- weekly count uses created_at rather than the first rows of the page.
+CREATE OR REPLACE FUNCTION public.user_stats(
+    p_user_id UUID,
+    p_session_limit INTEGER DEFAULT 100
+)
+RETURNS JSONB AS $$
+BEGIN
+    RETURN (
+        SELECT jsonb_build_object(
+            'total_sessions', COUNT(*),
+            'total_practice_minutes', COALESCE(SUM(s.duration_seconds), 0) / 60,
+            'average_band', AVG((s.overall_scores->>'overall_band')::NUMERIC),
+            'sessions_this_week', COUNT(*) FILTER (WHERE s.created_at >= NOW() - INTERVAL '7 days')
+        )
+        FROM (
+            SELECT duration_seconds, overall_scores, created_at
+            FROM public.sessions
+            WHERE user_id = p_user_id
+            ORDER BY created_at DESC
+            LIMIT p_session_limit
+        ) s
+    );
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- -----------------------------------------------------------------
+-- Error profile counts at session end (conversation websocket)
+-- -----------------------------------------------------------------
+-- p_counts: [{"category", "subcategory", "error_code", "count"}, ...]
+-- aggregated by the API; one upsert replaces a select + write per detected
+-- error. The function is written against whichever error_profiles shape is
+-- installed: schema_production.sql keys profiles by error_code and tracks
+-- last_occurred_at, the legacy schema.sql has neither.
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = 'public'
+          AND table_name = 'error_profiles'
+          AND column_name = 'error_code'
+    ) THEN
+        CREATE OR REPLACE FUNCTION public.bump_error_profiles(
+            p_user_id UUID,
+            p_counts JSONB
+        )
+        RETURNS VOID AS $fn$
+        BEGIN
+            INSERT INTO public.error_profiles (
+                user_id, category, subcategory, error_code,
+                occurrence_count, last_occurrence_count, last_occurred_at
+            )
+            SELECT p_user_id, c.category::error_category, c.subcategory, c.error_code,
+                   SUM(c.count), SUM(c.count), NOW()
+            FROM jsonb_to_recordset(p_counts)
+                AS c(category TEXT, subcategory TEXT, error_code TEXT, count INTEGER)
+            GROUP BY c.category, c.subcategory, c.error_code
+            ON CONFLICT (user_id, category, subcategory, error_code) DO UPDATE SET
+                occurrence_count = public.error_profiles.occurrence_count + EXCLUDED.occurrence_count,
+                last_occurrence_count = EXCLUDED.last_occurrence_count,
+                last_occurred_at = EXCLUDED.last_occurred_at;
+        END;
+        $fn$ LANGUAGE plpgsql;
+    ELSE
+        CREATE OR REPLACE FUNCTION public.bump_error_profiles(
+            p_user_id UUID,
+            p_counts JSONB
+        )
+        RETURNS VOID AS $fn$
+        BEGIN
+            -- No error_code column: codes of one subcategory share a row
+            INSERT INTO public.error_profiles (user_id, category, subcategory, occurrence_count, last_occurred)
+            SELECT p_user_id, c.category, c.subcategory, SUM(c.count), NOW()
+            FROM jsonb_to_recordset(p_counts) AS c(category TEXT, subcategory TEXT, count INTEGER)
+            GROUP BY c.category, c.subcategory
+            ON CONFLICT (user_id, category, subcategory) DO UPDATE SET
+                occurrence_count = public.error_profiles.occurrence_count + EXCLUDED.occurrence_count,
+                last_occurred = EXCLUDED.last_occurred;
+        END;
+        $fn$ LANGUAGE plpgsql;
+    END IF;
+END $$;
+
+-- -----------------------------------------------------------------
+-- Training task completion (POST /training/tasks/{id}/complete)
+-- -----------------------------------------------------------------
+-- Practice counters the API already reads and writes.
+ALTER TABLE public.training_tasks
+    ADD COLUMN IF NOT EXISTS times_practiced INTEGER DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS times_correct INTEGER DEFAULT 0;
+
+-- SM-2 schedule update in one statement; mirrors
+-- TrainingEngine.calculate_next_review. Returns no row when the task does
+-- not exist or belongs to another user.
+CREATE OR REPLACE FUNCTION public.sm2_update(
+    p_task_id UUID,
+    p_user_id UUID,
+    p_was_correct BOOLEAN
+)
+RETURNS SETOF public.training_tasks AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE public.training_tasks t
+    SET
+        interval_days = CASE
+            WHEN NOT p_was_correct THEN 1
+            WHEN COALESCE(t.repetition_count, 0) = 0 THEN 1
+            WHEN t.repetition_count = 1 THEN 6
+            ELSE ROUND(COALESCE(t.interval_days, 1) * COALESCE(t.ease_factor, 2.5))::INTEGER
+        END,
+        ease_factor = ROUND(GREATEST(
+            1.3,
+            COALESCE(t.ease_factor, 2.5) + CASE WHEN p_was_correct THEN 0.1 ELSE -0.2 END
+        ), 2),
+        repetition_count = CASE WHEN p_was_correct THEN COALESCE(t.repetition_count, 0) + 1 ELSE 0 END,
+        next_due_at = NOW() + make_interval(days => CASE
+            WHEN NOT p_was_correct THEN 1
+            WHEN COALESCE(t.repetition_count, 0) = 0 THEN 1
+            WHEN t.repetition_count = 1 THEN 6
+            ELSE ROUND(COALESCE(t.interval_days, 1) * COALESCE(t.ease_factor, 2.5))::INTEGER
+        END),
+        last_practiced_at = NOW(),
+        last_result = CASE WHEN p_was_correct THEN 'correct' ELSE 'incorrect' END,
+        times_practiced = COALESCE(t.times_practiced, 0) + 1,
+        times_correct = COALESCE(t.times_correct, 0) + CASE WHEN p_was_correct THEN 1 ELSE 0 END
+    WHERE t.id = p_task_id
+      AND t.user_id = p_user_id
+    RETURNING t.*;
+END;
+$$ LANGUAGE plpgsql;
+
+-- -----------------------------------------------------------------
+-- Training progress (GET /training/progress)
+-- -----------------------------------------------------------------
+-- Category is the error_code prefix before the first underscore, or OTHER.
+CREATE OR REPLACE FUNCTION public.progress_summary(
+    p_user_id UUID,
+    p_since TIMESTAMP WITH TIME ZONE
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_result JSONB;
+BEGIN
+    WITH by_cat AS (
+        SELECT
+            CASE
+                WHEN position('_' IN COALESCE(t.error_code, 'GRAM_OTHER')) > 0
+                    THEN split_part(COALESCE(t.error_code, 'GRAM_OTHER'), '_', 1)
+                ELSE 'OTHER'
+            END AS category,
+            COALESCE(SUM(t.times_practiced), 0) AS practiced,
+            COALESCE(SUM(t.times_correct), 0) AS correct,
+            COUNT(*) AS tasks
+        FROM public.training_tasks t
+        WHERE t.user_id = p_user_id
+          AND t.last_practiced_at >= p_since
+        GROUP BY 1
+    )
+    SELECT jsonb_build_object(
+        'total_practiced', COALESCE(SUM(practiced), 0),
+        'total_correct', COALESCE(SUM(correct), 0),
+        'tasks_count', COALESCE(SUM(tasks), 0),
+        'by_category', COALESCE(
+            jsonb_object_agg(category, jsonb_build_object('practiced', practiced, 'correct', correct))
+                FILTER (WHERE category IS NOT NULL),
+            '{}'::jsonb
+        )
+    )
+    INTO v_result
+    FROM by_cat;
+
+    RETURN v_result;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- -----------------------------------------------------------------
+-- Training and session filter indexes
+-- -----------------------------------------------------------------
+-- idx_training_due only covers active tasks; /training/tasks also lists
+-- tasks of any status ordered by next_due_at.
+CREATE INDEX IF NOT EXISTS idx_training_user_due
+    ON public.training_tasks(user_id, next_due_at);
+
+-- /training/progress and progress_summary filter on last_practiced_at.
+CREATE INDEX IF NOT EXISTS idx_training_user_last
+    ON public.training_tasks(user_id, last_practiced_at DESC);
+
+-- Already in schema_production.sql; created here for databases set up from
+-- the original schema.sql, which only indexes user_id and created_at apart.
+CREATE INDEX IF NOT EXISTS idx_sessions_user_created
+    ON public.sessions(user_id, created_at DESC);
+
+-- GET /sessions?mode=... filters by mode before the LIMIT.
+CREATE INDEX IF NOT EXISTS idx_sessions_user_mode_created
+    ON public.sessions(user_id, mode, created_at DESC);
@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta, timezone
 
-from app.services.coach_engine import coach_engine
+from app.services.coach_engine import build_mission_stats, coach_engine, mission_completion_rate
 
 
 def test_build_mnemonic_for_error_has_schedule():
@@ -85,3 +85,23 @@ def test_build_progress_proof_calculates_deltas():
     assert proof["before_after_audio"]["before"] == "https://example.com/before.mp3"
     assert proof["before_after_audio"]["after"] == "https://example.com/after.mp3"
 
+
+
+def test_mission_stats_roll_over_last_14_completions():
+    prefs: dict = {}
+    for i in range(20):
+        coach_engine.record_mission_completion(
+            preferences=prefs,
+            mission_id=f"m{i}",
+            tasks_completed=i % 3,
+            total_tasks=2,
+            rating=None,
+            notes=None,
+        )
+
+    coach = prefs["coach"]
+    expected = build_mission_stats(coach["mission_history"])
+    assert coach["mission_stats"]["last14_count"] == 14
+    assert abs(coach["mission_stats"]["last14_sum"] - expected["last14_sum"]) < 1e-6
+    assert mission_completion_rate(coach) == round(expected["last14_sum"] / 14, 2)
+    assert mission_completion_rate({}) is None
@@ -0,0 +1,23 @@
+from app.core.http_cache import etag_matches, session_etag
+
+
+def test_session_etag_only_for_finished_sessions():
+    active = {"id": "s1", "duration_seconds": 30, "ended_at": None}
+    finished = {**active, "ended_at": "2026-01-08T10:00:00+00:00", "overall_scores": {"overall_band": 6.5}}
+
+    assert session_etag(active) is None
+    etag = session_etag(finished)
+    assert etag.startswith('W/"')
+    assert session_etag({**finished, "overall_scores": {"overall_band": 7.0}}) != etag
+
+
+def test_etag_matches_weak_and_list_values():
+    etag = session_etag({"id": "s1", "ended_at": "2026-01-08T10:00:00+00:00"})
+    opaque = etag.removeprefix("W/")
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {opaque}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches("*", None)
@@ -0,0 +1,36 @@
+from app.services.speech import (
+    PARTIAL_WINDOW_SECONDS,
+    WEBM_CLUSTER_ID,
+    WEBM_MAGIC,
+    PartialTranscript,
+)
+
+
+def test_local_agreement_confirms_stable_prefix():
+    partial = PartialTranscript()
+
+    assert partial.agree("I went to".split()) == []
+    assert partial.agree("I went to the".split()) == ["I", "went", "to"]
+    # A revised hypothesis does not retract confirmed words
+    assert partial.agree("I want".split()) == ["I", "went", "to"]
+
+    partial.reset()
+    assert partial.confirmed_words == []
+    assert not partial.audio
+
+
+def test_full_window_restarts_with_stream_header():
+    partial = PartialTranscript()
+    header = WEBM_MAGIC + b"tracks"
+    chunk = WEBM_CLUSTER_ID + b"audio"
+
+    partial.add_chunk(header + chunk, now=3.0)
+    for second in range(6, 19, 3):
+        partial.add_chunk(chunk, now=float(second))
+    partial.agree(["hello", "there"])
+    assert partial.duration >= PARTIAL_WINDOW_SECONDS
+
+    # The next clean chunk commits the hypothesis and starts a short window
+    partial.add_chunk(chunk, now=21.0)
+    assert partial.committed_words == ["hello", "there"]
+    assert partial.window_bytes() == header + chunk
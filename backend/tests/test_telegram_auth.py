@@ -0,0 +1,41 @@
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import urlencode
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import telegram_auth
+
+
+def _signed_init_data(bot_token: str, user: dict, auth_date: int) -> str:
+    fields = {"auth_date": str(auth_date), "user": json.dumps(user)}
+    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret_key = hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret_key, data_check_string.encode("utf-8"), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+def test_validate_init_data_caches_successful_validation(monkeypatch):
+    monkeypatch.setattr(telegram_auth.settings, "TELEGRAM_BOT_TOKEN", "123:test-token")
+    telegram_auth._validated_init_data.clear()
+    init_data = _signed_init_data("123:test-token", {"id": 42, "first_name": "Ali"}, int(time.time()))
+
+    user = telegram_auth.validate_telegram_init_data(init_data)
+    assert user["id"] == 42
+
+    # A cached hit must not depend on re-parsing the payload.
+    monkeypatch.setattr(telegram_auth, "parse_qs", None)
+    assert telegram_auth.validate_telegram_init_data(init_data) == user
+
+
+def test_validate_init_data_rejects_tampered_payload(monkeypatch):
+    monkeypatch.setattr(telegram_auth.settings, "TELEGRAM_BOT_TOKEN", "123:test-token")
+    telegram_auth._validated_init_data.clear()
+    init_data = _signed_init_data("123:test-token", {"id": 42}, int(time.time()))
+
+    with pytest.raises(HTTPException) as exc:
+        telegram_auth.validate_telegram_init_data(init_data.replace("42", "43"))
+    assert exc.value.status_code == 401